@@ -0,0 +1,124 @@
+"""Closed-loop HTTP load generator (stdlib only).
+
+Each client thread keeps one keep-alive connection and sends requests back to
+back for --duration seconds; the report is requests/second and latency
+percentiles. See "Serving benchmark" in README.md.
+
+    python benchmarks/http_bench.py http://127.0.0.1:8000/api/products/ -c 16 -d 20
+
+--slow-client MS models slow clients (mobile networks, trickling proxies):
+every request opens a new connection and pauses MS milliseconds halfway
+through sending its headers, which holds a server thread on sync workers.
+
+    python benchmarks/http_bench.py http://127.0.0.1:8000/api/async/products/1/ -c 128 --slow-client 200
+"""
+import argparse
+import http.client
+import socket
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def worker(url, headers, stop_at, latencies, errors, reconnects):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    conn = None
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        reused = conn is not None
+        try:
+            if conn is None:
+                conn = conn_class(parts.netloc, timeout=30)
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException) as exc:
+            # A server may close an idle keep-alive connection (e.g. a worker
+            # being recycled); clients reconnect, so that is not an error.
+            if reused and isinstance(exc, (http.client.RemoteDisconnected, ConnectionResetError)):
+                reconnects.append(1)
+            else:
+                errors.append(exc.__class__.__name__)
+            if conn is not None:
+                conn.close()
+            conn = None
+            continue
+        latencies.append(time.perf_counter() - started)
+    if conn is not None:
+        conn.close()
+
+
+def slow_worker(url, headers, stop_at, latencies, errors, reconnects, pause):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    raw = ('\r\n'.join(lines) + '\r\n\r\n').encode()
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        try:
+            with socket.create_connection((parts.hostname, parts.port or 80), timeout=30) as sock:
+                sock.sendall(raw[:len(raw) // 2])
+                time.sleep(pause)
+                sock.sendall(raw[len(raw) // 2:])
+                response = http.client.HTTPResponse(sock)
+                response.begin()
+                response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(exc.__class__.__name__)
+            continue
+        if response.status >= 400:
+            errors.append(response.status)
+        latencies.append(time.perf_counter() - started)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url')
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-d', '--duration', type=float, default=10, help='Seconds to run.')
+    parser.add_argument('--slow-client', type=float, default=0, metavar='MS',
+                        help='Pause this long mid-headers on a fresh connection per request (http only).')
+    parser.add_argument('-H', '--header', action='append', default=[], help='Extra header, "Name: value".')
+    args = parser.parse_args()
+    headers = dict(header.split(':', 1) for header in args.header)
+    headers = {name.strip(): value.strip() for name, value in headers.items()}
+
+    latencies, errors, reconnects = [], [], []
+    stop_at = time.perf_counter() + args.duration
+    target, extra = worker, ()
+    if args.slow_client:
+        target, extra = slow_worker, (args.slow_client / 1000,)
+    threads = [threading.Thread(target=target, args=(args.url, headers, stop_at, latencies, errors, reconnects, *extra))
+               for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        raise SystemExit(f'No successful requests ({len(errors)} errors).')
+    ordered = sorted(latencies)
+    ms = lambda seconds: f'{seconds * 1000:.1f} ms'
+    print(f'{len(latencies)} requests in {elapsed:.1f}s, {len(errors)} errors, {len(reconnects)} reconnects')
+    print(f'requests/sec: {len(latencies) / elapsed:.1f}')
+    print(f'latency: mean {ms(statistics.fmean(ordered))}, p50 {ms(percentile(ordered, .50))}, '
+          f'p95 {ms(percentile(ordered, .95))}, p99 {ms(percentile(ordered, .99))}')
+
+
+if __name__ == '__main__':
+    main()
@@ -26,9 +26,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'drf_spectacular',
@@ -47,11 +48,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.middleware.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,9 +90,87 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST', 'db'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
-        'ATOMIC_REQUESTS': True,
+        # Keep connections open between requests instead of paying connect,
+        # TLS and auth on every one; health checks drop dead ones first.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
+# DB_POOL=1 switches to psycopg 3's connection pool (needs the `psycopg[pool]`
+# package instead of psycopg2). Pooled connections replace persistent ones.
+if os.getenv('DB_POOL') == '1':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {'pool': {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }}
+# Comma-separated replica hosts, e.g. POSTGRES_REPLICA_HOSTS=localhost to try
+# the routing locally against the primary itself.
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+# State shared by every worker (throttle buckets, metrics, read-your-writes
+# pins) defaults to
+# PostgreSQL cache tables, created by `manage.py createcachetable`. They are
+# reached through their own connection so cache writes never join, wait on
+# or roll back with a request's transaction; this adds up to one connection
+# per worker thread.
+CACHE_DATABASE = 'cache'
+DATABASES[CACHE_DATABASE] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['shop.routers.ReplicaRouter']
+# The pin must be seen by whichever worker serves the next read, so it lives
+# in a shared alias (see shared_cache() below).
+READ_YOUR_WRITES_CACHE_ALIAS = 'read_your_writes'
+READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+
+def shared_cache(name, max_entries):
+    # Table shop_<name>_cache through CACHE_DATABASE, unless
+    # <NAME>_CACHE_BACKEND/<NAME>_CACHE_LOCATION point the alias elsewhere,
+    # e.g. django.core.cache.backends.redis.RedisCache. Past max_entries
+    # live rows the table culls its oldest keys.
+    backend = os.getenv(f'{name.upper()}_CACHE_BACKEND')
+    if backend:
+        return {'BACKEND': backend, 'LOCATION': os.getenv(f'{name.upper()}_CACHE_LOCATION', name)}
+    return {'BACKEND': 'shop.cache.SharedDatabaseCache', 'LOCATION': f'shop_{name}_cache',
+            'OPTIONS': {'MAX_ENTRIES': max_entries}}
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Point CATALOG_CACHE_BACKEND at a shared backend (e.g.
+    # django.core.cache.backends.redis.RedisCache) when running several workers.
+    'catalog': {
+        'BACKEND': os.getenv('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+    },
+    # Request histograms, summed over every worker; never culled in practice.
+    'metrics': shared_cache('metrics', 100000),
+    'throttle': shared_cache('throttle', 10000),
+    'read_your_writes': shared_cache('read_your_writes', 10000),
+}
+CATALOG_CACHE_ALIAS = 'catalog'
+# Stock changes made by checkout/cancel are bulk UPDATEs and do not bump the
+# catalog generation, so this also bounds how stale listed stock can get.
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '60'))
+# Throttle buckets must be shared by every worker for the limits to hold,
+# hence shared_cache() above.
+THROTTLE_CACHE_ALIAS = 'throttle'
+# Per-view timing histograms (shop/metrics.py) served at /metrics. Workers
+# add their counts to METRICS_CACHE_ALIAS every METRICS_FLUSH_INTERVAL
+# seconds; as with throttling, that cache is shared between processes.
+# METRICS_ENABLED=0 removes the middleware.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_CACHE_ALIAS = 'metrics'
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
 
 
 # Password validation
@@ -136,12 +217,41 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_AUTHENTICATION_CLASSES': ('shop.authentication.CachedJWTAuthentication',),
+    # orjson-backed JSON; the browsable API only in development.
+    'DEFAULT_RENDERER_CLASSES': ['shop.renderers.ORJSONRenderer'] + (
+        ['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'shop.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'shop.pagination.EstimatedCountPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     "EXCEPTION_HANDLER": "shop.exception_handler.custom_exception_handler",
+    # Token buckets (shop/throttling.py): N/period is both the burst size and
+    # the average rate.
+    'DEFAULT_THROTTLE_RATES': {
+        'checkout': os.getenv('THROTTLE_RATE_CHECKOUT', '10/min'),
+        'cart': os.getenv('THROTTLE_RATE_CART', '120/min'),
+        'token': os.getenv('THROTTLE_RATE_TOKEN', '10/min'),
+        'catalog_anon': os.getenv('THROTTLE_RATE_CATALOG_ANON', '600/min'),
+    },
 }
+# Users resolved from JWTs are cached per (user id, jti) in each worker's
+# memory. A save or delete drops the entries of the worker that handled it;
+# other workers, and changes that bypass save(), catch up within this many
+# seconds. A shared alias would cost a cache round trip per request, about
+# what the lookup it replaces costs.
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', '60'))
+# Above this many (estimated) rows list endpoints report the planner's row
+# estimate instead of running COUNT(*); ?exact_count=true forces an exact count.
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', '10000'))
+# Stored responses for Idempotency-Key requests (checkout, pay, cancel) are
+# replayed for this many seconds; purge_idempotency_keys deletes them after.
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 60 * 60)))
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Shop API',
     'DESCRIPTION': 'Products, Cart, Orders, Auth (JWT).',
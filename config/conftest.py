@@ -2,10 +2,34 @@ from http.client import responses
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from model_bakery import baker
 from rest_framework.test import APIClient
 
 
+@pytest.fixture(autouse=True)
+def clear_caches(settings):
+    # Shared aliases default to tables on the `cache` connection, which tests
+    # do not open; one test process is served as well by LocMem.
+    settings.CACHES = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias,
+                'OPTIONS': config.get('OPTIONS', {})}
+        if config['BACKEND'] == 'shop.cache.SharedDatabaseCache' else config
+        for alias, config in settings.CACHES.items()
+    }
+    for cache in caches.all():
+        cache.clear()
+    yield
+@pytest.fixture(autouse=True)
+def inline_metrics_flush(settings):
+    # No flusher thread starts, so nothing writes to the caches between
+    # tests; observations are written when /metrics is scraped.
+    settings.METRICS_FLUSH_INTERVAL = 0
+@pytest.fixture(autouse=True)
+def primary_only(settings):
+    # Replica aliases are test mirrors on their own connection, which cannot
+    # see rows created inside the test transaction.
+    settings.DATABASE_REPLICAS = []
 @pytest.fixture
 def api_client():
     return APIClient()
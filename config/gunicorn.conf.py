@@ -0,0 +1,23 @@
+# Production profile: `gunicorn config.wsgi` picks this file up from the
+# working directory. Every knob can be overridden from the environment.
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+# gthread workers: requests are short and mostly wait on PostgreSQL, so a few
+# threads per process overlap that wait without the memory of extra processes.
+# Each thread keeps its own persistent DB connection, plus one to the shared
+# cache tables (settings.CACHE_DATABASE), so plan 2 * workers * threads (per
+# container) below PostgreSQL's max_connections.
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+# Recycle workers now and then so slow leaks cannot pile up; jitter keeps
+# them from restarting together.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
@@ -0,0 +1,79 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import CategorySales, DailySales, Order, OrderItem, ProductSales
+
+# rollup model -> (conflict key columns, extra columns); values per column
+# come from COLUMNS below.
+ROLLUPS = (
+    (DailySales, ['day', 'status'], []),
+    (CategorySales, ['day', 'category_id', 'status'], []),
+    (ProductSales, ['day', 'product_id', 'category_id', 'status'], []),
+)
+COLUMNS = {
+    'day': '(o.created_at AT TIME ZONE %(tz)s)::date',
+    'status': '{status}',
+    'product_id': 'i.product_id',
+    'category_id': 'i.category_id',
+}
+
+ROLLUP_SQL = """
+    INSERT INTO {table} ({columns}, revenue, units, orders)
+    SELECT {values}, {sign} * SUM(i.quantity * i.price), {sign} * SUM(i.quantity), {sign} * COUNT(DISTINCT o.id)
+    FROM {item} i
+    JOIN {order} o ON o.id = i.order_id
+    {source}
+    GROUP BY {group}
+    ORDER BY {order_by}
+    {conflict}
+"""
+
+
+def _rollup_sql(model, key, extra, status, sign, source, group_extra=(), upsert=True):
+    columns = key + extra
+    values = [COLUMNS[column].format(status=status) for column in columns]
+    table = model._meta.db_table
+    conflict = ''
+    if upsert:
+        # Rows are written in key order, so concurrent transactions take
+        # their row locks in the same sequence.
+        conflict = 'ON CONFLICT ({}) DO UPDATE SET {}'.format(', '.join(key), ', '.join(
+            f'{name} = {table}.{name} + EXCLUDED.{name}' for name in ('revenue', 'units', 'orders')))
+    return ROLLUP_SQL.format(
+        table=table, columns=', '.join(columns), values=', '.join(values), sign=sign,
+        item=OrderItem._meta.db_table, order=Order._meta.db_table,
+        source=source, group=', '.join(values + list(group_extra)),
+        order_by=', '.join(values[:len(key)]), conflict=conflict,
+    )
+
+
+def record_sales(order_ids, status, previous=None):
+    # Moves the lines of `order_ids` into `status` in every rollup, and out
+    # of `previous` when the orders had one. Must run in the transaction
+    # that changes the orders, after their rows are locked or created.
+    if not order_ids:
+        return
+    deltas = [(status, 1)] + ([(previous, -1)] if previous else [])
+    source = 'CROSS JOIN (VALUES {}) AS d(status, sign) WHERE i.order_id = ANY(%(ids)s)'.format(
+        ', '.join(f'(%(status{n})s, %(sign{n})s)' for n in range(len(deltas))))
+    params = {'tz': timezone.get_default_timezone_name(), 'ids': list(order_ids)}
+    for n, (name, sign) in enumerate(deltas):
+        params[f'status{n}'], params[f'sign{n}'] = name, sign
+    with connection.cursor() as cursor:
+        for model, key, extra in ROLLUPS:
+            cursor.execute(_rollup_sql(model, key, extra, 'd.status', 'd.sign', source, ['d.sign']), params)
+
+
+def rebuild_sales():
+    # Recomputes every rollup from the order tables. The table lock makes
+    # concurrent checkouts, payments and cancellations wait until the new
+    # totals are committed and then apply their changes on top of them.
+    params = {'tz': timezone.get_default_timezone_name()}
+    counts = {}
+    tables = [connection.ops.quote_name(model._meta.db_table) for model, _, _ in ROLLUPS]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {", ".join(tables)} IN EXCLUSIVE MODE')
+        for table, (model, key, extra) in zip(tables, ROLLUPS):
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(_rollup_sql(model, key, extra, 'o.status', 1, '', upsert=False), params)
+            counts[model._meta.model_name] = cursor.rowcount
+    return counts
@@ -0,0 +1,10 @@
+from django.urls import path
+from .async_views import AsyncProductListView,AsyncProductDetailView,AsyncCategoryListView,AsyncCategoryDetailView,AsyncCartView,AsyncOrderDetailView
+urlpatterns = [
+    path('products/', AsyncProductListView.as_view(), name='async-product-list'),
+    path('products/<int:pk>/', AsyncProductDetailView.as_view(), name='async-product-detail'),
+    path('categories/', AsyncCategoryListView.as_view(), name='async-category-list'),
+    path('categories/<int:pk>/', AsyncCategoryDetailView.as_view(), name='async-category-detail'),
+    path('cart/', AsyncCartView.as_view(), name='async-cart-detail'),
+    path('orders/<int:pk>/', AsyncOrderDetailView.as_view(), name='async-order-detail'),
+]
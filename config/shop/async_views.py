@@ -0,0 +1,200 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views import View
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound, Throttled, ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.request import Request
+from .authentication import CachedJWTAuthentication
+from .cache import cache_key, catalog_cache, record_hit, record_miss
+from .exception_handler import custom_exception_handler
+from .models import Cart, Category, Order, Product
+from .pagination import EstimatedCountPagination, ProductPagination
+from .renderers import ORJSONRenderer
+from .routers import _read_alias, choose_replica
+from .search import ProductSearchFilter
+from .serializers import CartSerializer, CategorySerializer, OrderSerializer, ProductSerializer
+from .throttling import AnonCatalogThrottle
+from .values import values_serializer
+
+BOOLEANS = {'true': True, '1': True, 'false': False, '0': False}
+
+
+class AsyncAPIView(View):
+    # Read-only JSON endpoints on Django's async view and ORM API. Auth,
+    # replica routing, the catalog cache, error bodies, pagination and JSON
+    # rendering are the same as the DRF views', so a response is the sync
+    # endpoint's body, with page links pointing back at the async URL.
+    http_method_names = ['get', 'head', 'options']
+    authentication = CachedJWTAuthentication()
+    login_required = False
+    use_replica = False
+    cache_namespace = None
+    throttle_classes = ()
+    renderer = ORJSONRenderer()
+
+    def prepare(self, request, kwargs):
+        # The auth, cache and pinning backends are sync; doing all of their
+        # work in one thread hop is much cheaper than a sync_to_async per call.
+        result = self.authentication.authenticate(request)
+        user = result[0] if result else AnonymousUser()
+        if self.login_required and not user.is_authenticated:
+            raise NotAuthenticated()
+        self.request.user = user
+        for throttle in [throttle_class() for throttle_class in self.throttle_classes]:
+            if not throttle.allow_request(self.request, self):
+                raise Throttled(throttle.wait())
+        alias = choose_replica(user) if self.use_replica else None
+        key = data = None
+        if self.cache_namespace and not user.is_staff:
+            key = cache_key(self.request, self.cache_namespace, **kwargs)
+            data = catalog_cache().get(key)
+            if data is not None:
+                record_hit()
+            else:
+                record_miss()
+        return user, alias, key, data
+
+    async def dispatch(self, request, *args, **kwargs):
+        replica_token = None
+        self.request = Request(request, authenticators=())
+        try:
+            request.user, alias, key, data = await sync_to_async(self.prepare)(request, kwargs)
+            if data is not None:
+                return self.render(data, headers={'X-Cache': 'HIT'})
+            if alias is not None:
+                replica_token = _read_alias.set(alias)
+            response = await super().dispatch(request, *args, **kwargs)
+            if key is not None:
+                if response.status_code == 200:
+                    await catalog_cache().aset(key, response.data, timeout=settings.CATALOG_CACHE_TIMEOUT)
+                response['X-Cache'] = 'MISS'
+            return response
+        except Http404 as exc:
+            return self.handle_exception(NotFound(*exc.args))
+        except APIException as exc:
+            return self.handle_exception(exc)
+        finally:
+            if replica_token is not None:
+                _read_alias.reset(replica_token)
+
+    def render(self, data, status=200, headers=None):
+        response = HttpResponse(self.renderer.render(data), status=status,
+                                content_type='application/json', headers=headers)
+        response.data = data
+        return response
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            exc.auth_header = self.authentication.authenticate_header(self.request)
+        response = custom_exception_handler(exc, {'view': self, 'request': self.request})
+        if response is None:
+            raise exc
+        headers = {name: value for name, value in response.items() if name.lower() != 'content-type'}
+        return self.render(response.data, status=response.status_code, headers=headers)
+
+
+class AsyncListView(AsyncAPIView):
+    model = None
+    serializer_class = None
+    search_backend = SearchFilter
+    search_fields = None
+    ordering_fields = None
+    filter_fields = {}
+    pagination_class = EstimatedCountPagination
+
+    def filter_queryset(self, queryset):
+        params = self.request.query_params
+        for name, kind in self.filter_fields.items():
+            value = params.get(name)
+            if value in (None, ''):
+                continue
+            if kind is bool:
+                if value.lower() not in BOOLEANS:
+                    raise ValidationError({name: ['Enter a valid boolean.']})
+                value = BOOLEANS[value.lower()]
+            else:
+                try:
+                    value = kind(value)
+                except ValueError:
+                    raise ValidationError({name: ['Select a valid choice. That choice is not one of the available choices.']})
+            queryset = queryset.filter(**{name: value})
+        queryset = self.search_backend().filter_queryset(self.request, queryset, self)
+        return OrderingFilter().filter_queryset(self.request, queryset, self)
+
+    async def get(self, request, *args, **kwargs):
+        serializer = values_serializer(self.serializer_class)
+        paginator = self.pagination_class()
+        queryset = serializer.queryset(self.filter_queryset(self.model.objects.all()))
+        rows = await paginator.apaginate_queryset(queryset, self.request, self)
+        return self.render(paginator.get_paginated_response(serializer.to_representation(rows)).data)
+
+
+class AsyncDetailView(AsyncAPIView):
+    model = None
+    serializer_class = None
+
+    async def get(self, request, pk, *args, **kwargs):
+        obj = await aget_object_or_404(self.model, pk=pk)
+        return self.render(self.serializer_class(obj).data)
+
+
+class AsyncProductListView(AsyncListView):
+    model = Product
+    serializer_class = ProductSerializer
+    use_replica = True
+    cache_namespace = 'async-product-list'
+    throttle_classes = (AnonCatalogThrottle,)
+    search_backend = ProductSearchFilter
+    ordering_fields = ['price', 'created_at']
+    filter_fields = {'category': int, 'is_active': bool}
+    pagination_class = ProductPagination
+
+
+class AsyncProductDetailView(AsyncDetailView):
+    model = Product
+    serializer_class = ProductSerializer
+    use_replica = True
+    cache_namespace = 'product-detail'
+    throttle_classes = (AnonCatalogThrottle,)
+
+
+class AsyncCategoryListView(AsyncListView):
+    model = Category
+    serializer_class = CategorySerializer
+    use_replica = True
+    cache_namespace = 'async-category-list'
+    throttle_classes = (AnonCatalogThrottle,)
+    search_fields = ['name']
+    ordering_fields = ['name']
+
+
+class AsyncCategoryDetailView(AsyncDetailView):
+    model = Category
+    serializer_class = CategorySerializer
+    use_replica = True
+    cache_namespace = 'category-detail'
+    throttle_classes = (AnonCatalogThrottle,)
+
+
+class AsyncCartView(AsyncAPIView):
+    login_required = True
+
+    async def get(self, request, *args, **kwargs):
+        cart, created = await Cart.objects.with_totals().aget_or_create(user=request.user)
+        if created:
+            # A created cart comes back without the annotation and prefetch,
+            # and the serializer would query for them synchronously.
+            cart = await Cart.objects.with_totals().aget(pk=cart.pk)
+        return self.render(CartSerializer(cart).data)
+
+
+class AsyncOrderDetailView(AsyncAPIView):
+    login_required = True
+    use_replica = True
+
+    async def get(self, request, pk, *args, **kwargs):
+        order = await aget_object_or_404(Order.objects.prefetch_related('items'), pk=pk, user=request.user)
+        return self.render(OrderSerializer(order).data)
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+def _cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'auth:user-version:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache = _cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        if not cache.add(_version_key(user_id), 1, timeout=None):
+            cache.incr(_version_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # Caches the user resolved for a (user id, token jti) pair for
+    # AUTH_USER_CACHE_TIMEOUT seconds. Saving or deleting the user bumps a
+    # per-user version, which drops every entry for that user in this
+    # process's cache at once. Other workers, and changes that bypass save(),
+    # pick the change up when their entry expires.
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if user_id is None or jti is None:
+            return super().get_user(validated_token)
+        cache = _cache()
+        key = f'auth:user:{user_id}:{jti}'
+        cached = cache.get_many([key, _version_key(user_id)])
+        version = cached.get(_version_key(user_id), 0)
+        entry = cached.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        user = super().get_user(validated_token)
+        cache.set(key, (version, user), timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
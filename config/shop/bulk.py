@@ -0,0 +1,172 @@
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from rest_framework import serializers
+from .cache import bump_generation
+from .exceptions import KeyedAPIException
+from .models import Category, Product
+from .search import update_search_vectors
+
+FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+STAGING_TABLE = 'shop_catalog_import'
+
+
+class CategoryRowSerializer(serializers.Serializer):
+    slug = serializers.SlugField(max_length=120)
+    name = serializers.CharField(max_length=120)
+    is_active = serializers.BooleanField(default=True)
+
+
+class ProductRowSerializer(serializers.Serializer):
+    slug = serializers.SlugField(max_length=120)
+    name = serializers.CharField(max_length=120)
+    category = serializers.SlugField(max_length=120)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = serializers.IntegerField(min_value=0)
+    is_active = serializers.BooleanField(default=True)
+
+
+class CatalogSpec:
+    def __init__(self, model, serializer_class, staging_ddl, merge_sql, export_fields):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.columns = tuple(serializer_class().fields)
+        self.staging_ddl = staging_ddl
+        self.merge_sql = merge_sql
+        self.export_fields = export_fields
+
+
+CATALOG = {
+    'category': CatalogSpec(
+        Category, CategoryRowSerializer,
+        staging_ddl='line bigint, slug varchar(120), name varchar(120), is_active boolean',
+        merge_sql=f"""
+            INSERT INTO {Category._meta.db_table} (slug, name, is_active)
+            SELECT DISTINCT ON (slug) slug, name, is_active FROM {STAGING_TABLE}
+            ORDER BY slug, line DESC
+            ON CONFLICT (slug) DO UPDATE
+            SET name = EXCLUDED.name, is_active = EXCLUDED.is_active
+            RETURNING (xmax = 0) AS created
+        """,
+        export_fields=('slug', 'name', 'is_active'),
+    ),
+    'product': CatalogSpec(
+        Product, ProductRowSerializer,
+        staging_ddl=('line bigint, slug varchar(120), name varchar(120), category varchar(120), '
+                     'price numeric(10, 2), stock integer, is_active boolean'),
+        merge_sql=f"""
+            INSERT INTO {Product._meta.db_table}
+                (slug, name, category_id, price, stock, is_active, created_at, updated_at)
+            SELECT DISTINCT ON (s.slug) s.slug, s.name, c.id, s.price, s.stock, s.is_active, now(), now()
+            FROM {STAGING_TABLE} s JOIN {Category._meta.db_table} c ON c.slug = s.category
+            ORDER BY s.slug, s.line DESC
+            ON CONFLICT (slug) DO UPDATE
+            SET name = EXCLUDED.name, category_id = EXCLUDED.category_id, price = EXCLUDED.price,
+                stock = EXCLUDED.stock, is_active = EXCLUDED.is_active, updated_at = EXCLUDED.updated_at
+            RETURNING (xmax = 0) AS created
+        """,
+        export_fields=('slug', 'name', 'category__slug', 'price', 'stock', 'is_active'),
+    ),
+}
+
+
+def get_spec(kind):
+    try:
+        return CATALOG[kind]
+    except KeyError:
+        raise KeyedAPIException(detail=f"Unknown catalog type '{kind}'.", key="type", status_code=404)
+
+
+def read_records(stream, fmt):
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise KeyedAPIException(detail="Invalid JSON line.", key="row", row=number)
+
+
+def copy_csv(cursor, table, columns, buffer):
+    # `cursor` is the driver cursor (psycopg2 or psycopg 3), not Django's wrapper.
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    if hasattr(cursor, 'copy_expert'):
+        cursor.copy_expert(sql, buffer)
+    else:
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def import_catalog(kind, records, chunk_size=5000):
+    spec = get_spec(kind)
+    records = iter(records)
+    rows = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
+        cursor.execute(f'CREATE TEMPORARY TABLE {STAGING_TABLE} ({spec.staging_ddl}) ON COMMIT DROP')
+        while chunk := list(islice(records, chunk_size)):
+            serializer = spec.serializer_class(data=chunk, many=True)
+            if not serializer.is_valid():
+                index, errors = next((i, e) for i, e in enumerate(serializer.errors) if e)
+                key, msg = next(iter(errors.items()))
+                raise KeyedAPIException(detail=str(msg[0]), key=key, row=rows + index + 1)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for offset, row in enumerate(serializer.validated_data, start=rows + 1):
+                writer.writerow([offset, *(row[column] for column in spec.columns)])
+            buffer.seek(0)
+            copy_csv(cursor.cursor, STAGING_TABLE, ('line',) + spec.columns, buffer)
+            rows += len(chunk)
+        if spec.model is Product:
+            cursor.execute(
+                f'SELECT s.line FROM {STAGING_TABLE} s LEFT JOIN {Category._meta.db_table} c '
+                f'ON c.slug = s.category WHERE c.id IS NULL ORDER BY s.line LIMIT 1'
+            )
+            missing = cursor.fetchone()
+            if missing:
+                raise KeyedAPIException(detail="Category not found.", key="category", row=missing[0])
+        cursor.execute(f'WITH merged AS ({spec.merge_sql}) '
+                       f'SELECT count(*), count(*) FILTER (WHERE created) FROM merged')
+        merged, created = cursor.fetchone()
+        if spec.model is Product:
+            update_search_vectors(Product.objects.filter(slug__in=RawSQL(f'SELECT slug FROM {STAGING_TABLE}', [])))
+    transaction.on_commit(bump_generation)
+    return {'rows': rows, 'created': created, 'updated': merged - created}
+
+
+def export_catalog(kind, fmt, chunk_size=2000):
+    spec = get_spec(kind)
+    columns = [field.split('__')[0] for field in spec.export_fields]
+    rows = (spec.model.objects.order_by('pk')
+            .values_list(*spec.export_fields)
+            .iterator(chunk_size=chunk_size))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(columns)
+    batch = 0
+    for row in rows:
+        if fmt == 'csv':
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row)), default=str))
+            buffer.write('\n')
+        batch += 1
+        if batch == chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            batch = 0
+    yield buffer.getvalue()
@@ -0,0 +1,157 @@
+import base64
+import hashlib
+import pickle
+import time
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connections, router, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+GENERATION_KEY = 'catalog:generation'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+
+def catalog_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _incr(key, initial=1):
+    cache = catalog_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # add() keeps a concurrent first increment from being overwritten
+        if not cache.add(key, initial, timeout=None):
+            return cache.incr(key)
+        return initial
+
+
+def get_generation():
+    generation = catalog_cache().get(GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock so an evicted counter never comes back at a
+        # value that older cached responses were stored under.
+        catalog_cache().add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = catalog_cache().get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    return _incr(GENERATION_KEY, initial=time.time_ns())
+
+
+def record_hit():
+    _incr(HITS_KEY)
+
+
+def record_miss():
+    _incr(MISSES_KEY)
+
+
+def cache_stats():
+    values = catalog_cache().get_many([HITS_KEY, MISSES_KEY, GENERATION_KEY])
+    return {
+        'hits': values.get(HITS_KEY, 0),
+        'misses': values.get(MISSES_KEY, 0),
+        'generation': values.get(GENERATION_KEY),
+    }
+
+
+def cache_key(request, namespace, **kwargs):
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    raw = '|'.join([request.get_host(), namespace, urlencode(sorted(kwargs.items())), urlencode(params)])
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'catalog:{get_generation()}:{digest}'
+
+
+class CatalogCacheMixin:
+    cache_namespace = None
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_staff:
+            return super().get(request, *args, **kwargs)
+        cache = catalog_cache()
+        key = cache_key(request, self.cache_namespace or type(self).__name__, **kwargs)
+        data = cache.get(key)
+        if data is not None:
+            record_hit()
+            return Response(data, headers={'X-Cache': 'HIT'})
+        record_miss()
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.CATALOG_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class SharedDatabaseCache(DatabaseCache):
+    # Default backend for state every worker process must see (throttle
+    # buckets, metrics, read-your-writes pins). ReplicaRouter sends it to
+    # the CACHE_DATABASE connection, so its writes commit on their own
+    # rather than with the request's transaction. incr() locks the row and
+    # keeps its expiry; the stock get-then-set loses concurrent increments
+    # and resets the timeout. update() is the same for any other change.
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        table = connection.ops.quote_name(self._table)
+        now = connection.ops.adapt_datetimefield_value(timezone.now().replace(microsecond=0))
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(f'SELECT value FROM {table} WHERE cache_key = %s AND expires >= %s FOR UPDATE', [key, now])
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found.")
+            value = pickle.loads(base64.b64decode(row[0].encode())) + delta
+            cursor.execute(f'UPDATE {table} SET value = %s WHERE cache_key = %s', [
+                base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1'), key])
+        return value
+
+    def update(self, key, function, timeout=DEFAULT_TIMEOUT, version=None):
+        # Atomic read-modify-write: function(value, or None when the key is
+        # missing or expired) returns (new value, result), and update()
+        # returns result. Concurrent updates of a key wait on its row lock.
+        # Nothing is culled by count; inserting a key drops a few expired
+        # rows that no other transaction holds.
+        key = self.make_and_validate_key(key, version=version)
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        table = connection.ops.quote_name(self._table)
+        now = timezone.now().replace(microsecond=0)
+        timeout = self.get_backend_timeout(timeout)
+        expires = datetime.max if timeout is None else datetime.fromtimestamp(
+            timeout, tz=dt_timezone.utc if settings.USE_TZ else None)
+        now, expires = (connection.ops.adapt_datetimefield_value(value)
+                        for value in (now, expires.replace(microsecond=0)))
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            while True:
+                cursor.execute(f'SELECT value, expires >= %s FROM {table} WHERE cache_key = %s FOR UPDATE', [now, key])
+                row = cursor.fetchone()
+                current = pickle.loads(base64.b64decode(row[0].encode())) if row and row[1] else None
+                value, result = function(current)
+                value = base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+                if row is not None:
+                    cursor.execute(f'UPDATE {table} SET value = %s, expires = %s WHERE cache_key = %s',
+                                   [value, expires, key])
+                    return result
+                # A concurrent first update may insert the key first; then
+                # this one waits for it and runs again on its row.
+                cursor.execute(f'INSERT INTO {table} (cache_key, value, expires) VALUES (%s, %s, %s) '
+                               f'ON CONFLICT (cache_key) DO NOTHING', [key, value, expires])
+                if cursor.rowcount:
+                    break
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE cache_key IN (SELECT cache_key FROM {table} '
+                           f'WHERE expires < %s LIMIT 100 FOR UPDATE SKIP LOCKED)', [now])
+        return result
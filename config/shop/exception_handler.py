@@ -1,9 +1,15 @@
-from rest_framework.views import exception_handler as drf_handler
+import math
+from rest_framework.views import exception_handler as drf_handler, set_rollback
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.exceptions import ValidationError, NotFound, NotAuthenticated, PermissionDenied
+from rest_framework.exceptions import ValidationError, NotFound, NotAuthenticated, PermissionDenied, Throttled
+from .exceptions import KeyedAPIException
 
 def custom_exception_handler(exc, context):
+    if isinstance(exc, KeyedAPIException):
+        set_rollback()
+        return Response(exc.get_full_details(), status=exc.status_code)
+
     if isinstance(exc, ValidationError):
         if isinstance(exc.detail, dict):
             key, msg = next(iter(exc.detail.items()))
@@ -18,6 +24,10 @@ def custom_exception_handler(exc, context):
     if isinstance(exc, (NotAuthenticated, PermissionDenied)):
         return Response({"detail": str(exc), "key": "auth"}, status=status.HTTP_401_UNAUTHORIZED)
 
+    if isinstance(exc, Throttled):
+        headers = {"Retry-After": str(math.ceil(exc.wait))} if exc.wait is not None else None
+        return Response({"detail": str(exc.detail), "key": "throttle"}, status=status.HTTP_429_TOO_MANY_REQUESTS, headers=headers)
+
     response = drf_handler(exc, context)
     if response is not None:
         response.data["status_code"] = response.status_code
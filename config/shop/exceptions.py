@@ -18,9 +18,9 @@ class KeyedAPIException(APIException):
 class NotFoundKeyed(KeyedAPIException):
     status_code=404
     default_detail='Object not found'
-    def __init__(self,detail=None,key='object'):
-        super().__init__(detail or self.default_detail,key=key,status_code=404)
+    def __init__(self,detail=None,key='object',**extras):
+        super().__init__(detail or self.default_detail,key=key,status_code=404,**extras)
 
 class StockError(KeyedAPIException):
-    def __init__(self,available,detail='Not enough in stock.'):
-        super().__init__(detail=detail,key='quantity',available=available)
+    def __init__(self,available,detail='Not enough in stock.',**extras):
+        super().__init__(detail=detail,key='quantity',available=available,**extras)
@@ -0,0 +1,72 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from .exceptions import KeyedAPIException
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+# Response headers stored with the key and sent again on replay.
+STORED_HEADERS = ('Location',)
+
+
+def fingerprint(request, args, kwargs):
+    payload = json.dumps([request.method, request.path, kwargs, request.data],
+                         sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def idempotent(handler):
+    # Requests carrying an Idempotency-Key run at most once per (user, key).
+    # The key row is inserted in the same transaction as the handler's work
+    # and holds its lock until commit, so a concurrent retry blocks on the
+    # unique index and then replays the stored response; a later retry
+    # replays it straight from the table without touching any other rows.
+    # 5xx responses and unhandled errors roll the claim back so the client
+    # can retry for real.
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(self, request, *args, **kwargs)
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise KeyedAPIException(detail="Idempotency-Key must be 1-255 characters.", key="idempotency_key")
+        digest = fingerprint(request, args, kwargs)
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+                user=request.user, key=key, defaults={'fingerprint': digest, 'expires_at': expires_at},
+            )
+            if not created and record.expires_at > now:
+                if record.fingerprint != digest:
+                    raise KeyedAPIException(detail="Idempotency-Key was already used for a different request.",
+                                            key="idempotency_key", status_code=422)
+                return Response(record.response, status=record.status_code,
+                                headers={**record.headers, REPLAY_HEADER: 'true'})
+            try:
+                with transaction.atomic():
+                    response = handler(self, request, *args, **kwargs)
+            except Exception as exc:
+                # Not self.handle_exception(): AtomicWriteMixin would mark
+                # this block, and with it the stored response, for rollback.
+                response = self.get_exception_handler()(exc, self.get_exception_handler_context())
+                if response is None:
+                    raise
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+                return response
+            record.fingerprint = digest
+            record.status_code = response.status_code
+            record.response = response.data
+            record.headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+            record.expires_at = expires_at
+            record.save(update_fields=['fingerprint', 'status_code', 'response', 'headers', 'expires_at'])
+        return response
+    return wrapper
@@ -0,0 +1,50 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from shop.models import Category, Product
+from shop.serializers import ProductSerializer
+from shop.values import values_serializer
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = ('Compare ProductSerializer with the .values() read path. Inserts --rows '
+            'throwaway products in a transaction that is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            category = Category.objects.create(name='Bench', slug='bench-serializers')
+            Product.objects.bulk_create(
+                Product(category=category, name=f'Bench product {i}', slug=f'bench-serializers-{i}',
+                        price=Decimal(i % 5000) + Decimal('0.99'), stock=i % 100)
+                for i in range(rows)
+            )
+            queryset = Product.objects.filter(category=category).order_by('id')
+            fast = values_serializer(ProductSerializer)
+            instances = list(queryset)
+            values = list(fast.queryset(queryset))
+            assert ProductSerializer(instances, many=True).data == fast.to_representation(values)
+            results = {
+                'ProductSerializer, serialize only': best_of(repeat, lambda: ProductSerializer(instances, many=True).data),
+                'ValuesSerializer, serialize only': best_of(repeat, lambda: fast.to_representation(values)),
+                'ProductSerializer, fetch + serialize': best_of(repeat, lambda: ProductSerializer(list(queryset), many=True).data),
+                'ValuesSerializer, fetch + serialize': best_of(repeat, lambda: fast.to_representation(list(fast.queryset(queryset)))),
+            }
+            transaction.set_rollback(True)
+        per_thousand = 1000 / rows
+        for label, seconds in results.items():
+            self.stdout.write(f'{label:<40} {seconds * 1000 * per_thousand:8.2f} ms / 1000 rows')
@@ -0,0 +1,21 @@
+import sys
+from django.core.management.base import BaseCommand
+from shop.bulk import CATALOG, export_catalog
+
+
+class Command(BaseCommand):
+    help = 'Stream categories or products as CSV or NDJSON using a server-side cursor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(CATALOG))
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--output', help='File to write; defaults to stdout.')
+
+    def handle(self, *args, **options):
+        out = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in export_catalog(options['kind'], options['format']):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,26 @@
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from shop.bulk import CATALOG, import_catalog, read_records
+from shop.exceptions import KeyedAPIException
+
+
+class Command(BaseCommand):
+    help = 'Upsert categories or products by slug from a CSV or NDJSON file via COPY.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(CATALOG))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        fmt = options['format'] or ('csv' if path.suffix == '.csv' else 'ndjson')
+        with path.open('rb') as stream:
+            try:
+                result = import_catalog(options['kind'], read_records(stream, fmt), chunk_size=options['chunk_size'])
+            except KeyedAPIException as exc:
+                raise CommandError(exc.get_full_details())
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['rows']} rows: {result['created']} created, {result['updated']} updated."
+        ))
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from shop.services import process_checkout_jobs
+
+
+class Command(BaseCommand):
+    help = ('Place orders for queued async checkouts. Several workers can run side by side; '
+            'each claims its own batch with SKIP LOCKED.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--idle-sleep', type=float, default=0.5, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit.')
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            count = process_checkout_jobs(options['batch_size'])
+            processed += count
+            if count:
+                self.stdout.write(f'Processed {count} checkout jobs.')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['idle_sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} checkout jobs.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from shop.analytics import rebuild_sales
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily, category and product sales rollups from the order tables.'
+
+    def handle(self, *args, **options):
+        counts = rebuild_sales()
+        summary = ', '.join(f'{rows} {name}' for name, rows in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups: {summary} rows.'))
@@ -0,0 +1,46 @@
+import os
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from shop.seed import SeedPlan, seed_load_data
+
+
+class Command(BaseCommand):
+    help = ('Append a synthetic, production-shaped dataset: power-law product popularity, '
+            'long-tail order sizes and mixed order statuses, loaded with COPY by worker '
+            'processes. The same --seed and --until produce the same rows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=100)
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=20_000)
+        parser.add_argument('--carts', type=int, default=5_000)
+        parser.add_argument('--orders', type=int, default=300_000)
+        parser.add_argument('--max-lines', type=int, default=40, help='Largest number of lines in one order.')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of product popularity.')
+        parser.add_argument('--days', type=int, default=730, help='History length ending at --until.')
+        parser.add_argument('--until', type=date.fromisoformat, default=date.today(), help='YYYY-MM-DD, defaults to today.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        counts = {name: options[name] for name in ('categories', 'products', 'users', 'carts', 'orders')}
+        if any(value < 0 for value in counts.values()) or options['max_lines'] < 1 or options['days'] < 1 \
+                or options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('Counts must not be negative; --max-lines, --days, --chunk-size and --workers must be positive.')
+        if counts['products'] and not counts['categories']:
+            raise CommandError('Products need at least one category.')
+        if (counts['orders'] or counts['carts']) and not (counts['users'] and counts['products']):
+            raise CommandError('Orders and carts need at least one user and one product.')
+        if counts['carts'] > counts['users']:
+            raise CommandError('At most one cart per user: --carts must not exceed --users.')
+        plan = SeedPlan(options['seed'], until=options['until'], days=options['days'], max_lines=options['max_lines'],
+                        skew=options['skew'], chunk_size=options['chunk_size'], **counts)
+        started = time.perf_counter()
+        verbose = options['verbosity'] > 1
+        totals = seed_load_data(plan, workers=options['workers'], progress=verbose and (
+            lambda totals: self.stdout.write(', '.join(f'{rows} {name}' for name, rows in totals.items()))))
+        summary = ', '.join(f'{rows} {name}' for name, rows in totals.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {summary} rows in {time.perf_counter() - started:.1f} s.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from shop.models import Product
+from shop.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Backfill Product.search_vector in primary key batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--only-missing', action='store_true', help='Skip rows that already have a vector.')
+
+    def handle(self, *args, **options):
+        batch = options['batch_size']
+        last_id = Product.objects.aggregate(last=Max('id'))['last'] or 0
+        updated = 0
+        for start in range(0, last_id, batch):
+            qs = Product.objects.filter(pk__gt=start, pk__lte=start + batch)
+            if options['only_missing']:
+                qs = qs.filter(search_vector__isnull=True)
+            updated += update_search_vectors(qs)
+        self.stdout.write(self.style.SUCCESS(f'Updated search vectors for {updated} products.'))
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+
+
+class Command(BaseCommand):
+    help = 'Block until the database accepts connections, backing off between attempts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--timeout', type=float, default=60, help='Give up after this many seconds.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.1
+        while True:
+            try:
+                connection.ensure_connection()
+                break
+            except OperationalError as exc:
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(f'Database unavailable after {options["timeout"]:g}s: {exc}')
+                self.stdout.write(f'Waiting for database ({exc.__class__.__name__}), retrying in {delay:.1f}s')
+                time.sleep(delay)
+                delay = min(delay * 2, 2)
+        self.stdout.write(self.style.SUCCESS('Database is ready.'))
@@ -0,0 +1,147 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 5, 10, 20, 50, 100)
+# name -> (help, bucket bounds, scale); sums are stored as integers (µs for
+# seconds) so every shared backend can incr() them.
+HISTOGRAMS = {
+    'request_duration_seconds': ('Wall time per request.', SECONDS, 1_000_000),
+    'db_queries': ('SQL statements per request.', QUERIES, 1),
+    'db_duration_seconds': ('Time spent in SQL per request.', SECONDS, 1_000_000),
+    'serialize_duration_seconds': ('Time spent rendering the response body per request.', SECONDS, 1_000_000),
+}
+PREFIX = 'shop_'
+UNMATCHED = 'unmatched'
+VIEWS_KEY = 'metrics:views'
+logger = logging.getLogger(__name__)
+
+
+def metrics_cache():
+    return caches[settings.METRICS_CACHE_ALIAS]
+
+
+def _key(name, view, suffix):
+    return f'metrics:{name}:{view}:{suffix}'
+
+
+def _incr(cache, key, delta):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            return cache.incr(key, delta)
+        return delta
+
+
+class Recorder:
+    # Observations are summed per process and added to METRICS_CACHE_ALIAS
+    # with incr(), so every worker adds into the same counters. Only a
+    # background thread (every METRICS_FLUSH_INTERVAL seconds), the exit
+    # hook and a scrape write them: a request never pays for the cache
+    # round trips, and under ASGI the sync cache is never called from the
+    # event loop. With an interval of 0 no thread starts.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.views = set()
+        self.flusher_pid = None
+
+    def start_flusher(self):
+        # Per process: a thread started before a fork does not survive it.
+        if self.flusher_pid == os.getpid() or settings.METRICS_FLUSH_INTERVAL <= 0:
+            return
+        self.flusher_pid = os.getpid()
+        threading.Thread(target=self.flush_periodically, name='metrics-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+    def flush_periodically(self):
+        while (interval := settings.METRICS_FLUSH_INTERVAL) > 0:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                if self.pending:
+                    self.flush()
+            except Exception:
+                logger.exception('Flushing request metrics failed.')
+
+    def observe(self, view, values):
+        with self.lock:
+            self.start_flusher()
+            if view not in self.views:
+                self.pending[(None, view)] = 1
+            for name, value in values.items():
+                _, bounds, scale = HISTOGRAMS[name]
+                for key, delta in ((_key(name, view, bisect_left(bounds, value)), 1),
+                                   (_key(name, view, 'sum'), round(value * scale))):
+                    self.pending[key] = self.pending.get(key, 0) + delta
+
+    def take(self):
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def flush(self):
+        with self.lock:
+            pending = self.take()
+        self.write(pending)
+
+    def write(self, pending):
+        cache = metrics_cache()
+        for key, delta in pending.items():
+            if isinstance(key, tuple):
+                # Register the view once in the shared index: a marker
+                # taken with add(), then a numbered slot for the scraper.
+                view = key[1]
+                if cache.add(f'{VIEWS_KEY}:seen:{view}', 1, timeout=None):
+                    cache.set(f'{VIEWS_KEY}:{_incr(cache, VIEWS_KEY, 1)}', view, timeout=None)
+                self.views.add(view)
+            else:
+                _incr(cache, key, delta)
+
+
+recorder = Recorder()
+
+
+def _labels(view, **extra):
+    labels = {'view': view, **extra}
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                    for name, value in labels.items())
+
+
+def _bound(value):
+    return repr(float(value))
+
+
+def render_metrics():
+    # Prometheus text exposition (version 0.0.4) of every view any worker
+    # has flushed.
+    recorder.flush()
+    cache = metrics_cache()
+    slots = cache.get(VIEWS_KEY, 0)
+    views = sorted(cache.get_many([f'{VIEWS_KEY}:{slot}' for slot in range(1, slots + 1)]).values())
+    keys = [_key(name, view, suffix)
+            for name, (_, bounds, _) in HISTOGRAMS.items() for view in views
+            for suffix in [*range(len(bounds) + 1), 'sum']]
+    values = cache.get_many(keys)
+    lines = []
+    for name, (help_text, bounds, scale) in HISTOGRAMS.items():
+        metric = PREFIX + name
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+        for view in views:
+            counts = [values.get(_key(name, view, index), 0) for index in range(len(bounds) + 1)]
+            if not any(counts):
+                continue
+            total = 0
+            for bound, count in zip([*map(_bound, bounds), '+Inf'], counts):
+                total += count
+                lines.append(f'{metric}_bucket{{{_labels(view, le=bound)}}} {total}')
+            lines.append(f'{metric}_sum{{{_labels(view)}}} {values.get(_key(name, view, "sum"), 0) / scale}')
+            lines.append(f'{metric}_count{{{_labels(view)}}} {total}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,91 @@
+import time
+from contextlib import ExitStack
+from functools import partial
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from .metrics import UNMATCHED, recorder
+from .routers import pin_to_primary
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user)
+        return response
+
+
+class MetricsMiddleware:
+    # Times each request per resolved URL name: wall time, SQL statements and
+    # time (execute_wrapper on every connection) and response rendering.
+    # Results go to the Server-Timing header and to shop.metrics histograms.
+    # Async views run their queries in worker threads, so under ASGI only
+    # wall and render time are recorded for them.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = request._timings = {'db_queries': 0, 'db_duration_seconds': 0.0}
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(partial(self.time_query, timings)))
+            response = self.get_response(request)
+        return self.finish(request, response, start)
+
+    async def __acall__(self, request):
+        request._timings = {}
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.finish(request, response, start)
+
+    @staticmethod
+    def time_query(timings, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings['db_duration_seconds'] += time.perf_counter() - start
+            timings['db_queries'] += 1
+
+    def process_template_response(self, request, response):
+        # First in MIDDLEWARE, so this runs right before response.render().
+        timings = request._timings
+        start = time.perf_counter()
+
+        def rendered(response):
+            timings['serialize_duration_seconds'] = time.perf_counter() - start
+        response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, start):
+        timings = request._timings
+        timings['request_duration_seconds'] = time.perf_counter() - start
+        match = request.resolver_match
+        recorder.observe(match.view_name if match else UNMATCHED, timings)
+        parts = [f'app;dur={timings["request_duration_seconds"] * 1000:.2f}']
+        if 'db_queries' in timings:
+            parts.append(f'db;dur={timings["db_duration_seconds"] * 1000:.2f};desc="{timings["db_queries"]} queries"')
+        if 'serialize_duration_seconds' in timings:
+            parts.append(f'serialize;dur={timings["serialize_duration_seconds"] * 1000:.2f}')
+        response['Server-Timing'] = ', '.join(parts)
+        return response
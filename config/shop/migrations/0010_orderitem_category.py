@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_idempotencykey_headers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.category'),
+        ),
+        # Existing lines take their product's current category; run
+        # rebuild_sales_rollups afterwards so the rollups agree with them.
+        migrations.RunSQL(
+            'UPDATE shop_orderitem i SET category_id = p.category_id FROM shop_product p WHERE p.id = i.product_id; '
+            'SET CONSTRAINTS ALL IMMEDIATE',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.category'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='productsales',
+            name='unique_product_sales',
+        ),
+        migrations.AddConstraint(
+            model_name='productsales',
+            constraint=models.UniqueConstraint(fields=('day', 'product', 'category', 'status'), name='unique_product_category_sales'),
+        ),
+    ]
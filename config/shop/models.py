@@ -1,5 +1,9 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import F, Prefetch, Q, Sum
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 class Category(models.Model):
     name = models.CharField(max_length=120)
     slug = models.SlugField(max_length=120,unique=True)
@@ -15,11 +19,27 @@ class Product(models.Model):
     is_active = models.BooleanField(default = True)
     created_at = models.DateTimeField(auto_now_add = True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True,editable=False)
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'],name='product_search_vector_gin'),
+            GinIndex(fields=['name'],name='product_name_trgm_gin',opclasses=['gin_trgm_ops']),
+            models.Index(fields=['category','price','id'],condition=Q(is_active=True),name='product_active_cat_price_idx'),
+            models.Index(fields=['category','created_at','id'],condition=Q(is_active=True),name='product_active_cat_new_idx'),
+            models.Index(fields=['price','id'],name='product_price_id_idx'),
+            models.Index(fields=['created_at','id'],name='product_created_id_idx'),
+        ]
     def __str__(self):
         return f'{self.name}'
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        items = CartItem.objects.annotate(subtotal=F('quantity') * F('product__price')).order_by('id')
+        return (self.annotate(total=Sum(F('items__quantity') * F('items__product__price')))
+                .prefetch_related(Prefetch('items', queryset=items)))
 class Cart(models.Model):
     user = models.ForeignKey(User,on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    objects = CartQuerySet.as_manager()
     def __str__(self):
         return f"Cart for {self.user}"
 
@@ -27,6 +47,10 @@ class CartItem(models.Model):
     cart = models.ForeignKey(to=Cart,on_delete=models.CASCADE,related_name='items')
     product = models.ForeignKey(to=Product,on_delete=models.CASCADE,related_name='in_cart_items')
     quantity = models.PositiveIntegerField(default=1)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart','product'],name='unique_cart_product'),
+        ]
     def __str__(self):
         return f"ID:{self.cart} for {self.product}"
 class Order(models.Model):
@@ -40,12 +64,88 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length = 10,choices=Status.choices,default=Status.NEW)
     total_price = models.DecimalField(default=0,max_digits=10,decimal_places=2)
+    class Meta:
+        indexes = [
+            models.Index(fields=['user','-created_at','-id'],name='order_user_created_idx'),
+        ]
     def __str__(self):
         return f"Order for {self.user}"
 class OrderItem(models.Model):
     order = models.ForeignKey(to=Order,on_delete=models.CASCADE,related_name='items')
     product = models.ForeignKey(to=Product,on_delete=models.CASCADE,related_name='in_order_items')
+    # The product's category at checkout, like price; the sales rollups
+    # keep counting the line there if the product moves.
+    category = models.ForeignKey(to=Category,on_delete=models.CASCADE,related_name='+')
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10,decimal_places=2)
     def __str__(self):
         return f"ID:{self.order} for {self.product} price is {self.quantity * self.price}"
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User,on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True,encoder=DjangoJSONEncoder)
+    headers = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user','key'],name='unique_user_idempotency_key'),
+        ]
+    def __str__(self):
+        return f"{self.key} for {self.user}"
+class CheckoutJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+    user = models.ForeignKey(User,on_delete=models.CASCADE)
+    status = models.CharField(max_length=10,choices=Status.choices,default=Status.PENDING)
+    # cart snapshot: [[cart item id, product id, quantity], ...]
+    items = models.JSONField()
+    order = models.ForeignKey(Order,null=True,blank=True,on_delete=models.SET_NULL)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    error = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'],condition=Q(status='PENDING'),name='checkoutjob_pending_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user'],condition=Q(status='PENDING'),name='one_pending_checkout_per_user'),
+        ]
+    def __str__(self):
+        return f"Checkout job {self.pk} for {self.user}"
+class SalesRollup(models.Model):
+    # Order lines pre-aggregated per day (in TIME_ZONE) and order status;
+    # kept current by shop.analytics and rebuilt by rebuild_sales_rollups.
+    day = models.DateField()
+    status = models.CharField(max_length=10,choices=Order.Status.choices)
+    revenue = models.DecimalField(default=0,max_digits=14,decimal_places=2)
+    units = models.BigIntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    class Meta:
+        abstract = True
+class DailySales(SalesRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day','status'],name='unique_daily_sales'),
+        ]
+class CategorySales(SalesRollup):
+    category = models.ForeignKey(Category,on_delete=models.CASCADE,related_name='+')
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day','category','status'],name='unique_category_sales'),
+        ]
+class ProductSales(SalesRollup):
+    product = models.ForeignKey(Product,on_delete=models.CASCADE,related_name='+')
+    category = models.ForeignKey(Category,on_delete=models.CASCADE,related_name='+')
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day','product','category','status'],name='unique_product_category_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['category','day'],name='productsales_category_day_idx'),
+        ]
@@ -0,0 +1,256 @@
+import base64
+import json
+from asgiref.sync import sync_to_async
+from functools import partial
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .exceptions import KeyedAPIException
+
+
+class KeysetPagination(BasePagination):
+    # Pages are addressed by the (ordering field, id) of the row at the edge
+    # of the previous page, so deep pages cost the same as the first one and
+    # no COUNT(*) is needed.
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    default_ordering = '-id'
+    ordering_fields = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        allowed = self.ordering_fields or getattr(view, 'ordering_fields', None) or []
+        for field in queryset.query.order_by:
+            if isinstance(field, str) and field.lstrip('-') in allowed:
+                return field
+        return self.default_ordering
+
+    def encode_cursor(self, row, reverse):
+        # Rows are model instances or .values() dicts.
+        value = row.__getitem__ if isinstance(row, dict) else partial(getattr, row)
+        payload = {'id': value('id'), 'r': int(reverse)}
+        if self.field != 'id':
+            payload['v'] = str(value(self.field))
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            position = {'id': int(payload['id'])}
+            if self.field != 'id':
+                position['v'] = model._meta.get_field(self.field).to_python(payload['v'])
+            position['r'] = bool(payload.get('r'))
+        except Exception:
+            raise KeyedAPIException(detail="Invalid cursor.", key=self.cursor_query_param)
+        return position
+
+    def seek(self, position, descending):
+        op = 'lt' if descending else 'gt'
+        after_id = Q(**{f'id__{op}': position['id']})
+        if self.field == 'id':
+            return after_id
+        return Q(**{f'{self.field}__{op}': position['v']}) | (Q(**{self.field: position['v']}) & after_id)
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset, view)
+        self.field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        self.position = self.decode_cursor(request, queryset.model)
+        self.reverse = bool(self.position and self.position['r'])
+        if self.reverse:
+            descending = not descending
+        prefix = '-' if descending else ''
+        fields = [f'{prefix}id'] if self.field == 'id' else [f'{prefix}{self.field}', f'{prefix}id']
+        queryset = queryset.order_by(*fields)
+        if self.position:
+            queryset = queryset.filter(self.seek(self.position, descending))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        self.page = rows
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page([row async for row in queryset])
+
+    def get_link(self, row, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def estimate_count(queryset):
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedPage(Page):
+    def __init__(self, object_list, number, paginator, more):
+        super().__init__(object_list, number, paginator)
+        self.more = more
+
+    def has_next(self):
+        return self.more
+
+
+class EstimatedCountPaginator(Paginator):
+    # Counts exactly up to `threshold` rows (a bounded COUNT over a LIMIT
+    # subquery); past that it reports the planner's row estimate instead of
+    # scanning the whole result. Pages are then bounded by the rows found.
+    def __init__(self, object_list, per_page, threshold, exact=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.threshold = threshold
+        self.exact = exact
+        self.count_is_exact = True
+
+    @cached_property
+    def count(self):
+        if self.exact or not hasattr(self.object_list, 'explain'):
+            return super().count
+        capped = self.object_list.order_by()[:self.threshold].count()
+        if capped < self.threshold:
+            return capped
+        self.count_is_exact = False
+        return max(estimate_count(self.object_list), capped)
+
+    def validate_number(self, number):
+        self.count
+        if self.count_is_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_is_exact:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        return EstimatedPage(rows[:self.per_page], number, self, more=len(rows) > self.per_page)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    exact_count_query_param = 'exact_count'
+
+    @property
+    def django_paginator_class(self):
+        threshold = getattr(settings, 'PAGINATION_COUNT_ESTIMATE_THRESHOLD', 10000)
+        exact = self.request.query_params.get(self.exact_count_query_param, '').lower() in ('1', 'true', 'yes')
+        return partial(EstimatedCountPaginator, threshold=threshold, exact=exact)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # The count, its estimate and the page itself are sync ORM calls.
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_exact': self.page.paginator.count_is_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_exact'] = {'type': 'boolean'}
+        return response_schema
+
+
+class OrderPagination(KeysetPagination):
+    default_ordering = '-created_at'
+    ordering_fields = ['created_at']
+
+
+class ProductPagination(EstimatedCountPagination):
+    # Page-number responses stay the default; ?pagination=cursor or a
+    # ?cursor= link switches to keyset pages over the active ordering.
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def get_keyset(self, request):
+        params = request.query_params
+        if params.get(self.mode_query_param) == 'cursor' or self.keyset_class.cursor_query_param in params:
+            return self.keyset_class()
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.get_keyset(request)
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.get_keyset(request)
+        if self.keyset is not None:
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
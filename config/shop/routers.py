@@ -0,0 +1,71 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+_read_alias = ContextVar('shop_read_alias', default=None)
+
+
+def _pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def pin_to_primary(user):
+    # Called after a successful write so the user's next reads within
+    # READ_YOUR_WRITES_SECONDS see their own changes despite replica lag.
+    # READ_YOUR_WRITES_CACHE_ALIAS must be shared by all workers, or a read
+    # served by another worker goes to a replica anyway.
+    caches[settings.READ_YOUR_WRITES_CACHE_ALIAS].set(_pin_key(user.pk), True, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def choose_replica(user):
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return None
+    if user.is_authenticated and caches[settings.READ_YOUR_WRITES_CACHE_ALIAS].get(_pin_key(user.pk)):
+        return None
+    return random.choice(replicas)
+
+
+def _is_cache(model):
+    # DatabaseCache's internal model.
+    return model._meta.app_label == 'django_cache'
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _is_cache(model):
+            return settings.CACHE_DATABASE
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        if _is_cache(model):
+            return settings.CACHE_DATABASE
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    def initial(self, request, *args, **kwargs):
+        self._replica_token = None
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            alias = choose_replica(request.user)
+            if alias is not None:
+                self._replica_token = _read_alias.set(alias)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if getattr(self, '_replica_token', None) is not None:
+                _read_alias.reset(self._replica_token)
+                self._replica_token = None
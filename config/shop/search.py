@@ -0,0 +1,31 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from rest_framework.filters import SearchFilter
+
+SEARCH_CONFIG = 'english'
+
+
+def product_search_vector():
+    return SearchVector('name', weight='A', config=SEARCH_CONFIG) + SearchVector('slug', weight='C', config=SEARCH_CONFIG)
+
+
+def update_search_vectors(queryset):
+    return queryset.update(search_vector=product_search_vector())
+
+
+class ProductSearchFilter(SearchFilter):
+    # Word matches come from the stored tsvector (GIN index), partial and
+    # misspelled terms from pg_trgm word similarity on name (trigram index).
+    # Results are ranked by relevance unless ?ordering= is given; a row whose
+    # search_vector is not filled in yet ranks on similarity alone.
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        text = ' '.join(terms)
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        return (queryset
+                .filter(Q(search_vector=query) | Q(name__trigram_word_similar=text))
+                .annotate(search_rank=Coalesce(SearchRank(F('search_vector'), query), 0.0) + TrigramWordSimilarity(text, 'name'))
+                .order_by('-search_rank', 'id'))
@@ -0,0 +1,274 @@
+import csv
+import io
+import math
+import multiprocessing
+import random
+import zlib
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from statistics import NormalDist
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from .analytics import rebuild_sales
+from .bulk import copy_csv
+from .cache import bump_generation
+from .models import Cart, CartItem, Category, Order, OrderItem, Product
+from .search import update_search_vectors
+
+PASSWORD = 'load-password'
+STATUSES = [Order.Status.PAID, Order.Status.NEW, Order.Status.CANCELLED]
+STATUS_WEIGHTS = [80, 12, 8]
+# Power-law exponents: category sizes, repeat customers, lines per order or
+# cart, and quantity per line. Product popularity is SeedPlan.skew.
+CATEGORY_SKEW = 0.8
+USER_SKEW = 0.7
+LINES_SKEW = 1.6
+QUANTITY_SKEW = 2.5
+MAX_QUANTITY = 10
+MAX_CART_LINES = 20
+WORDS = ('steel', 'oak', 'linen', 'wireless', 'compact', 'classic', 'outdoor', 'smart',
+         'travel', 'kitchen', 'garden', 'studio', 'lamp', 'chair', 'kettle', 'backpack',
+         'speaker', 'jacket', 'blender', 'monitor', 'desk', 'bottle', 'headphones', 'rug')
+MASK = (1 << 64) - 1
+NORMAL = NormalDist()
+
+
+class SeedPlan:
+    # Counts, the id ranges the new rows take and the shared parameters;
+    # pickled once into every worker.
+    def __init__(self, seed, categories, products, users, carts, orders, until, days,
+                 max_lines, skew, chunk_size):
+        self.seed = seed
+        self.counts = {'category': categories, 'product': products, 'user': users,
+                       'cart': carts, 'order': orders}
+        self.start = datetime.combine(until, time(), tzinfo=dt_timezone.utc) - timedelta(days=days)
+        self.span = days * 86400
+        self.max_lines = max_lines
+        self.skew = skew
+        self.chunk_size = chunk_size
+        # A fixed salt keeps the hash, like every other column, reproducible.
+        self.password = make_password(PASSWORD, salt=f'load{seed}')
+        self.base = {
+            'category': Category.objects.aggregate(last=Max('id'))['last'] or 0,
+            'product': Product.objects.aggregate(last=Max('id'))['last'] or 0,
+            'user': User.objects.aggregate(last=Max('id'))['last'] or 0,
+            'cart': Cart.objects.aggregate(last=Max('id'))['last'] or 0,
+            'order': Order.objects.aggregate(last=Max('id'))['last'] or 0,
+        }
+        # Popularity rank -> product: a stride coprime with the product count
+        # is a bijection, so best sellers are spread over ids and categories.
+        self.stride = max(int(products * 0.618), 1) | 1
+        while math.gcd(self.stride, max(products, 1)) != 1:
+            self.stride += 2
+
+    def rng(self, kind, n):
+        # One generator per row, so a row does not depend on the chunk size
+        # or the worker that writes it.
+        return random.Random(_mix(self.seed, kind, n))
+
+    def stamp(self, kind, n):
+        # Ids grow with time, as they do in production.
+        offset = (n + _unit(self.seed, kind, n)) / max(self.counts[kind], 1) * self.span
+        return (self.start + timedelta(seconds=offset)).isoformat()
+
+    def product(self, rng):
+        rank = zipf(rng.random(), self.counts['product'], self.skew)
+        return (rank - 1) * self.stride % self.counts['product']
+
+    def category(self, n):
+        # Stateless too: order lines record their product's category.
+        return self.base['category'] + zipf(_unit(self.seed, 'category', n), self.counts['category'], CATEGORY_SKEW)
+
+    def price_cents(self, n):
+        # Stateless, so order lines can price any product without loading it.
+        u = min(max(_unit(self.seed, 'price', n), 1e-9), 1 - 1e-9)
+        return min(max(round(math.exp(math.log(2500) + NORMAL.inv_cdf(u))), 50), 9_999_999)
+
+
+def _mix(seed, stream, n):
+    # splitmix64 of (seed, stream, n).
+    x = (seed * 0x9E3779B97F4A7C15 + zlib.crc32(stream.encode()) * 0xBF58476D1CE4E5B9 + n) & MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+
+def _unit(seed, stream, n):
+    return (_mix(seed, stream, n) >> 11) / (1 << 53)
+
+
+def zipf(u, n, s):
+    # Rank in 1..n for a uniform u, inverting the continuous power law
+    # p(x) ~ x**-s on [1, n + 1). O(1) per draw, no table of n weights.
+    if n <= 1:
+        return 1
+    if abs(s - 1) < 1e-9:
+        rank = (n + 1) ** u
+    else:
+        a = 1 - s
+        rank = (((n + 1) ** a - 1) * u + 1) ** (1 / a)
+    return min(int(rank), n)
+
+
+def _money(cents):
+    return f'{cents // 100}.{cents % 100:02d}'
+
+
+def _distinct_products(plan, rng, count):
+    chosen = {}
+    for _ in range(count * 20):
+        if len(chosen) == count:
+            break
+        chosen.setdefault(plan.product(rng), None)
+    return list(chosen)
+
+
+def _copy(table, columns, rows):
+    buffer = io.StringIO()
+    # Quoted, so empty strings are not read as NULL.
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        copy_csv(cursor.cursor, table, columns, buffer)
+
+
+def load_categories(plan, start, stop):
+    base = plan.base['category']
+    _copy(Category._meta.db_table, ('id', 'name', 'slug', 'is_active'), (
+        (base + n + 1, f'Load category {base + n + 1}', f'load-category-{base + n + 1}', True)
+        for n in range(start, stop)))
+    return {'category': stop - start}
+
+
+def load_users(plan, start, stop):
+    base = plan.base['user']
+    _copy(User._meta.db_table, ('id', 'password', 'is_superuser', 'username', 'first_name', 'last_name',
+                                'email', 'is_staff', 'is_active', 'date_joined'), (
+        (base + n + 1, plan.password, False, f'load-user-{base + n + 1}', '', '',
+         f'load-user-{base + n + 1}@example.com', False, True, plan.stamp('user', n))
+        for n in range(start, stop)))
+    return {'user': stop - start}
+
+
+def load_products(plan, start, stop):
+    base = plan.base['product']
+    rows = []
+    for n in range(start, stop):
+        rng = plan.rng('product', n)
+        pk = base + n + 1
+        created = plan.stamp('product', n)
+        rows.append((pk, plan.category(n), f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {pk}',
+                     f'load-product-{pk}', _money(plan.price_cents(n)), rng.randrange(500),
+                     rng.random() < 0.95, created, created))
+    _copy(Product._meta.db_table, ('id', 'category_id', 'name', 'slug', 'price', 'stock', 'is_active',
+                                   'created_at', 'updated_at'), rows)
+    return {'product': len(rows)}
+
+
+def load_search_vectors(plan, start, stop):
+    base = plan.base['product']
+    return {'search_vector': update_search_vectors(Product.objects.filter(pk__gt=base + start, pk__lte=base + stop))}
+
+
+def load_carts(plan, start, stop):
+    base = plan.base
+    carts, items = [], []
+    for n in range(start, stop):
+        rng = plan.rng('cart', n)
+        pk = base['cart'] + n + 1
+        # One cart per user: the cart endpoints expect at most one.
+        carts.append((pk, base['user'] + n + 1, plan.stamp('cart', n)))
+        lines = min(zipf(rng.random(), MAX_CART_LINES, LINES_SKEW), plan.counts['product'])
+        for product in _distinct_products(plan, rng, lines):
+            items.append((pk, base['product'] + product + 1, zipf(rng.random(), MAX_QUANTITY, QUANTITY_SKEW)))
+    with transaction.atomic():
+        _copy(Cart._meta.db_table, ('id', 'user_id', 'created_at'), carts)
+        _copy(CartItem._meta.db_table, ('cart_id', 'product_id', 'quantity'), items)
+    return {'cart': len(carts), 'cart_item': len(items)}
+
+
+def load_orders(plan, start, stop):
+    base = plan.base
+    orders, items = [], []
+    for n in range(start, stop):
+        rng = plan.rng('order', n)
+        pk = base['order'] + n + 1
+        user = base['user'] + zipf(rng.random(), plan.counts['user'], USER_SKEW)
+        lines = min(zipf(rng.random(), plan.max_lines, LINES_SKEW), plan.counts['product'])
+        total = 0
+        for product in _distinct_products(plan, rng, lines):
+            quantity = zipf(rng.random(), MAX_QUANTITY, QUANTITY_SKEW)
+            price = plan.price_cents(product)
+            total += quantity * price
+            items.append((pk, base['product'] + product + 1, plan.category(product), quantity, _money(price)))
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        orders.append((pk, user, plan.stamp('order', n), status, _money(total)))
+    with transaction.atomic():
+        _copy(Order._meta.db_table, ('id', 'user_id', 'created_at', 'status', 'total_price'), orders)
+        _copy(OrderItem._meta.db_table, ('order_id', 'product_id', 'category_id', 'quantity', 'price'), items)
+    return {'order': len(orders), 'order_item': len(items)}
+
+
+LOADERS = {
+    'category': load_categories,
+    'user': load_users,
+    'product': load_products,
+    'search_vector': load_search_vectors,
+    'cart': load_carts,
+    'order': load_orders,
+}
+# Each phase only references rows committed by the ones before it.
+PHASES = (('category',), ('user', 'product'), ('search_vector', 'cart', 'order'))
+SOURCE = {'search_vector': 'product'}
+
+_plan = None
+
+
+def _init_worker(plan):
+    global _plan
+    import django
+    django.setup()
+    _plan = plan
+
+
+def _run(task):
+    kind, start, stop = task
+    return LOADERS[kind](_plan, start, stop)
+
+
+def seed_load_data(plan, workers=1, progress=None):
+    # Loads every phase in chunks of plan.chunk_size rows with COPY, in
+    # `workers` processes (inline when 1), then fixes the id sequences and
+    # rebuilds the sales rollups. Returns the rows written per table.
+    totals = Counter()
+    pool = None
+    if workers > 1:
+        # Children must not share the parent's connection.
+        connections.close_all()
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(plan,))
+    try:
+        for phase in PHASES:
+            tasks = [(kind, start, min(start + plan.chunk_size, plan.counts[SOURCE.get(kind, kind)]))
+                     for kind in phase
+                     for start in range(0, plan.counts[SOURCE.get(kind, kind)], plan.chunk_size)]
+            results = pool.imap_unordered(_run, tasks) if pool else (
+                LOADERS[kind](plan, start, stop) for kind, start, stop in tasks)
+            for rows in results:
+                totals.update(rows)
+                if progress:
+                    progress(totals)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    models = [Category, User, Product, Cart, CartItem, Order, OrderItem]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+        cursor.execute('ANALYZE ' + ', '.join(model._meta.db_table for model in models))
+    rebuild_sales()
+    transaction.on_commit(bump_generation)
+    return totals
@@ -1,10 +1,12 @@
+from datetime import timedelta
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Category,Product,Cart,CartItem,Order,OrderItem
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('search_vector',)
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -28,7 +30,23 @@ class CartItemSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({'quantity': f'Only {product.stock} items in stock.'})
         return attrs
     def get_subtotal(self,obj):
+        if hasattr(obj,'subtotal'):
+            return obj.subtotal
         return obj.quantity * obj.product.price
+class CartOperationSerializer(serializers.Serializer):
+    ADD = 'add'
+    UPDATE = 'update'
+    REMOVE = 'remove'
+    op = serializers.ChoiceField(choices=(ADD,UPDATE,REMOVE))
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0,required=False)
+    def validate(self,attrs):
+        qnt = attrs.get('quantity')
+        if attrs['op'] == self.ADD and not qnt:
+            raise serializers.ValidationError({'quantity':'Quantity must be at least 1.'})
+        if attrs['op'] == self.UPDATE and qnt is None:
+            raise serializers.ValidationError({'quantity':'This field is required.'})
+        return attrs
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many = True,read_only=True)
     total = serializers.SerializerMethodField(read_only=True)
@@ -37,6 +55,8 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ('id','user','created_at','items','total')
         read_only_fields = ('user','created_at','items','total')
     def get_total(self,obj):
+        if hasattr(obj,'total'):
+            return obj.total or 0
         qs = obj.items.select_related('product').all()
         return sum(item.quantity * item.product.price for item in qs)
 class OrderSerializer(serializers.ModelSerializer):
@@ -52,4 +72,38 @@ class OrderItemSerializer(serializers.ModelSerializer):
     def validate_quantity(self,value):
         if value<=0:
             raise serializers.ValidationError('Quantity must be at least 1.')
-        return value
\ No newline at end of file
+        return value
+class OrderBatchCancelSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1),allow_empty=False,max_length=10000)
+class SalesRangeSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=Order.Status.choices,default=Order.Status.PAID)
+    max_days = 366
+    def validate(self,attrs):
+        end = attrs.setdefault('end',timezone.localdate())
+        start = attrs.setdefault('start',end - timedelta(days=29))
+        if start > end:
+            raise serializers.ValidationError({'start':'Must not be after end.'})
+        if (end - start).days >= self.max_days:
+            raise serializers.ValidationError({'start':f'At most {self.max_days} days per query.'})
+        return attrs
+class SalesQuerySerializer(SalesRangeSerializer):
+    product = serializers.IntegerField(min_value=1,required=False)
+    category = serializers.IntegerField(min_value=1,required=False)
+class TopSalesQuerySerializer(SalesRangeSerializer):
+    category = serializers.IntegerField(min_value=1,required=False)
+    by = serializers.ChoiceField(choices=('revenue','units','orders'),default='revenue')
+    limit = serializers.IntegerField(min_value=1,max_value=100,default=10)
+class SalesRowSerializer(serializers.Serializer):
+    revenue = serializers.DecimalField(max_digits=14,decimal_places=2)
+    units = serializers.IntegerField()
+    orders = serializers.IntegerField()
+class DailySalesSerializer(SalesRowSerializer):
+    day = serializers.DateField()
+class ProductSalesSerializer(SalesRowSerializer):
+    product = serializers.IntegerField()
+    name = serializers.CharField(source='product__name')
+class CategorySalesSerializer(SalesRowSerializer):
+    category = serializers.IntegerField()
+    name = serializers.CharField(source='category__name')
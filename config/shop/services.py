@@ -0,0 +1,252 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, Value, When, PositiveIntegerField, Sum
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from .models import Product, Cart, CartItem, CheckoutJob, Order, OrderItem
+from .analytics import record_sales
+from .exceptions import KeyedAPIException, NotFoundKeyed, StockError
+
+
+CART_UPSERT_SQL = """
+    INSERT INTO {item} (cart_id, product_id, quantity)
+    SELECT %(cart)s, p.id, %(quantity)s FROM {product} p
+    WHERE p.id = %(product)s AND p.stock >= %(quantity)s
+    ON CONFLICT (cart_id, product_id) DO UPDATE
+    SET quantity = {item}.quantity + EXCLUDED.quantity
+    WHERE {item}.quantity + EXCLUDED.quantity <= (
+        SELECT stock FROM {product} WHERE id = EXCLUDED.product_id
+    )
+    RETURNING id, quantity, (xmax = 0)
+""".format(item=CartItem._meta.db_table, product=Product._meta.db_table)
+
+
+def _per_product(mapping):
+    return Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in mapping.items()],
+        output_field=PositiveIntegerField(),
+    )
+
+
+def lock_products(product_ids):
+    # One SELECT ... FOR UPDATE, always in pk order so concurrent checkouts
+    # acquire row locks in the same sequence and cannot deadlock.
+    qs = (Product.objects.select_for_update()
+          .filter(pk__in=product_ids)
+          .order_by('pk')
+          .only('id', 'category_id', 'price', 'stock', 'is_active'))
+    return {product.pk: product for product in qs}
+
+
+def decrement_stock(demand):
+    if not demand:
+        return
+    updated = (Product.objects
+               .filter(pk__in=demand.keys(), stock__gte=_per_product(demand))
+               .update(stock=F('stock') - _per_product(demand)))
+    if updated != len(demand):
+        raise KeyedAPIException(detail="Not enough stock.", key="quantity")
+
+
+def add_to_cart(cart, product, quantity):
+    # Insert the line or add to its quantity in one statement; the stock
+    # check lives in the statement, so concurrent adds cannot overshoot it.
+    with connection.cursor() as cursor:
+        cursor.execute(CART_UPSERT_SQL, {'cart': cart.pk, 'product': product.pk, 'quantity': quantity})
+        row = cursor.fetchone()
+    if row is None:
+        return None, False
+    item_id, final_qnt, created = row
+    return CartItem(id=item_id, cart=cart, product=product, quantity=final_qnt), created
+
+
+def apply_cart_operations(cart, operations):
+    with transaction.atomic():
+        # The cart row lock holds back concurrent inserts of new lines (their
+        # foreign key check needs a share lock on it), the line locks hold
+        # back updates of existing ones, and products are locked in pk order
+        # after the lines as checkout does, so the stock check and the
+        # absolute quantities written below cannot go stale.
+        Cart.objects.select_for_update().filter(pk=cart.pk).exists()
+        existing = {item.product_id: item for item in cart.items.select_for_update().order_by('pk')}
+        products = lock_products({operation['product'] for operation in operations})
+        final = {product_id: item.quantity for product_id, item in existing.items()}
+        for index, operation in enumerate(operations):
+            product = products.get(operation['product'])
+            if product is None:
+                raise NotFoundKeyed("Product not found.", key="product", index=index)
+            if operation['op'] == 'remove':
+                final[product.pk] = 0
+                continue
+            qnt = operation['quantity']
+            if operation['op'] == 'add':
+                qnt += final.get(product.pk, 0)
+            if qnt and not product.is_active:
+                raise KeyedAPIException(detail="Product is inactive.", key="product", index=index)
+            if qnt > product.stock:
+                raise StockError(available=product.stock, index=index)
+            final[product.pk] = qnt
+        upserts = [
+            CartItem(cart=cart, product_id=product_id, quantity=qnt)
+            for product_id, qnt in final.items()
+            if qnt and (product_id not in existing or existing[product_id].quantity != qnt)
+        ]
+        removed = [item.pk for product_id, item in existing.items() if not final[product_id]]
+        if upserts:
+            CartItem.objects.bulk_create(upserts, update_conflicts=True,
+                                         unique_fields=['cart', 'product'], update_fields=['quantity'])
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete()
+
+
+def restock(order_ids):
+    returned = dict(OrderItem.objects
+                    .filter(order_id__in=order_ids)
+                    .values('product_id')
+                    .annotate(quantity=Sum('quantity'))
+                    .values_list('product_id', 'quantity'))
+    if returned:
+        # Lock in pk order first, as checkout does; the UPDATE alone would
+        # take the row locks in whatever order the plan visits them.
+        lock_products(returned.keys())
+        Product.objects.filter(pk__in=returned.keys()).update(stock=F('stock') + _per_product(returned))
+
+
+def check_lines(items, products, remaining):
+    # Validates (item_id, product_id, quantity) lines against locked products
+    # and the stock still unclaimed in `remaining`; returns the order total
+    # and the per-product demand without touching `remaining`.
+    demand = {}
+    total = 0
+    for item_id, product_id, quantity in items:
+        product = products.get(product_id)
+        if product is None:
+            raise NotFoundKeyed("Product not found.", key="product", item_id=item_id, product_id=product_id)
+        if not product.is_active:
+            raise KeyedAPIException(detail="Product is inactive.", key="product")
+        available = remaining[product_id] - demand.get(product_id, 0)
+        if quantity > available:
+            raise KeyedAPIException(
+                detail="Not enough stock.",
+                key="quantity",
+                item_id=item_id,
+                product_id=product_id,
+                available=available,
+            )
+        demand[product_id] = demand.get(product_id, 0) + quantity
+        total += product.price * quantity
+    return total, demand
+
+
+def create_order(user, items, products, total):
+    order = Order.objects.create(user=user, status=Order.Status.NEW, total_price=total)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=product_id, category_id=products[product_id].category_id,
+                  quantity=quantity, price=products[product_id].price)
+        for _, product_id, quantity in items
+    ])
+    return order
+
+
+def cart_lines(user, lock=False):
+    qs = CartItem.objects.filter(cart__user=user).order_by('pk')
+    if lock:
+        qs = qs.select_for_update(of=('self',))
+    items = list(qs.values_list('id', 'product_id', 'quantity'))
+    if not items:
+        raise KeyedAPIException(detail="Cart is empty.", key="cart")
+    return items
+
+
+def place_order(user):
+    with transaction.atomic():
+        items = cart_lines(user, lock=True)
+        products = lock_products({product_id for _, product_id, _ in items})
+        remaining = {pk: product.stock for pk, product in products.items()}
+        total, demand = check_lines(items, products, remaining)
+        order = create_order(user, items, products, total)
+        record_sales([order.pk], Order.Status.NEW)
+        decrement_stock(demand)
+        CartItem.objects.filter(pk__in=[item_id for item_id, _, _ in items]).delete()
+    return order
+
+
+def enqueue_checkout(user):
+    items = cart_lines(user)
+    try:
+        with transaction.atomic():
+            return CheckoutJob.objects.create(user=user, items=items)
+    except IntegrityError:
+        raise KeyedAPIException(detail="A checkout is already in progress.", key="checkout", status_code=409)
+
+
+def process_checkout_jobs(limit=50):
+    # Claims up to `limit` pending jobs (SKIP LOCKED, so workers never wait
+    # on each other's batches), locks the union of their products once in pk
+    # order and places the orders in job order against that shared stock
+    # snapshot. Stock and cart rows are then written once per batch instead
+    # of once per checkout.
+    with transaction.atomic():
+        jobs = list(CheckoutJob.objects.select_for_update(skip_locked=True)
+                    .filter(status=CheckoutJob.Status.PENDING)
+                    .select_related('user')
+                    .order_by('pk')[:limit])
+        if not jobs:
+            return 0
+        # The snapshots are only valid while their lines are unchanged: a
+        # sync checkout or a cart edit since enqueueing fails the job. Lines
+        # are locked before products, as in place_order.
+        current = {item_id: (product_id, quantity) for item_id, product_id, quantity in
+                   CartItem.objects.select_for_update()
+                   .filter(pk__in=[item_id for job in jobs for item_id, _, _ in job.items])
+                   .order_by('pk').values_list('id', 'product_id', 'quantity')}
+        products = lock_products({product_id for job in jobs for _, product_id, _ in job.items})
+        remaining = {pk: product.stock for pk, product in products.items()}
+        demand = {}
+        ordered_items = []
+        for job in jobs:
+            job.finished_at = timezone.now()
+            try:
+                if any(current.get(item_id) != (product_id, quantity) for item_id, product_id, quantity in job.items):
+                    raise KeyedAPIException(detail="Cart changed.", key="cart", status_code=409)
+                total, job_demand = check_lines(job.items, products, remaining)
+            except KeyedAPIException as exc:
+                job.status = CheckoutJob.Status.FAILED
+                job.status_code = exc.status_code
+                job.error = exc.get_full_details()
+                continue
+            job.order = create_order(job.user, job.items, products, total)
+            job.status = CheckoutJob.Status.DONE
+            for product_id, quantity in job_demand.items():
+                remaining[product_id] -= quantity
+                demand[product_id] = demand.get(product_id, 0) + quantity
+            ordered_items += [item_id for item_id, _, _ in job.items]
+        record_sales([job.order_id for job in jobs if job.order_id], Order.Status.NEW)
+        decrement_stock(demand)
+        CartItem.objects.filter(pk__in=ordered_items).delete()
+        CheckoutJob.objects.bulk_update(jobs, ['status', 'order', 'status_code', 'error', 'finished_at'])
+    return len(jobs)
+
+
+def cancel_order(user, pk):
+    with transaction.atomic():
+        order = get_object_or_404(Order.objects.select_for_update(), pk=pk, user=user)
+        if order.status != Order.Status.NEW:
+            raise KeyedAPIException(detail="Only NEW orders can be cancelled.", key="status")
+        restock([order.pk])
+        record_sales([order.pk], Order.Status.CANCELLED, previous=order.status)
+        order.status = Order.Status.CANCELLED
+        order.save(update_fields=['status'])
+    return order
+
+
+def cancel_orders(order_ids):
+    with transaction.atomic():
+        cancelled = list(Order.objects.select_for_update()
+                         .filter(pk__in=order_ids, status=Order.Status.NEW)
+                         .order_by('pk')
+                         .values_list('pk', flat=True))
+        if cancelled:
+            restock(cancelled)
+            record_sales(cancelled, Order.Status.CANCELLED, previous=Order.Status.NEW)
+            Order.objects.filter(pk__in=cancelled).update(status=Order.Status.CANCELLED)
+    return cancelled
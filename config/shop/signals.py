@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.contrib.auth import get_user_model
+from django.dispatch import receiver
+from .authentication import invalidate_cached_user
+from .models import Category, Product
+from .cache import bump_generation
+from .search import update_search_vectors
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    # After commit: bumped earlier, a concurrent read could cache the old
+    # rows under the new generation, where no later bump would evict them.
+    transaction.on_commit(bump_generation)
+
+
+@receiver(post_save, sender=Product)
+def refresh_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'name', 'slug'} & set(update_fields):
+        return
+    update_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
@@ -0,0 +1,74 @@
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+import pytest
+from shop.throttling import TokenBucketThrottle
+
+# Query budgets are always asserted. Timing is opt-in because it depends on
+# the machine:
+#   BENCH=1                compare p50 latency with BENCH_BASELINE
+#   BENCH=1 BENCH_UPDATE=1 (re)write the baseline from this run
+ENABLED = os.getenv('BENCH') == '1'
+UPDATE = os.getenv('BENCH_UPDATE') == '1'
+ROUNDS = int(os.getenv('BENCH_ROUNDS', '30'))
+# A case fails when p50 > baseline p50 * (1 + tolerance) + min delta; the
+# absolute slack keeps sub-millisecond cases from failing on noise.
+TOLERANCE = float(os.getenv('BENCH_TOLERANCE', '0.25'))
+MIN_DELTA_MS = float(os.getenv('BENCH_MIN_DELTA_MS', '1'))
+BASELINE = Path(os.getenv('BENCH_BASELINE', Path(__file__).with_name('baseline.json')))
+
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'p50_ms': round(cuts[49], 3), 'p95_ms': round(cuts[94], 3), 'p99_ms': round(cuts[98], 3)}
+
+
+class Bench:
+    def __init__(self, case, baseline, results):
+        self.case = case
+        self.baseline = baseline
+        self.results = results
+
+    def __call__(self, prepare, queries):
+        # prepare() resets whatever one request consumes and returns a
+        # callable that sends it; only the send is timed.
+        if not ENABLED:
+            return
+        samples = []
+        for _ in range(ROUNDS):
+            send = prepare()
+            started = time.perf_counter()
+            send()
+            samples.append((time.perf_counter() - started) * 1000)
+        stats = self.results[self.case] = {**percentiles(samples), 'queries': queries, 'rounds': ROUNDS}
+        reference = self.baseline.get(self.case)
+        if UPDATE or reference is None:
+            return
+        limit = reference['p50_ms'] * (1 + TOLERANCE) + MIN_DELTA_MS
+        assert stats['p50_ms'] <= limit, (
+            f"{self.case}: p50 {stats['p50_ms']:.2f} ms, baseline {reference['p50_ms']:.2f} ms "
+            f"(limit {limit:.2f} ms at BENCH_TOLERANCE={TOLERANCE})")
+
+
+@pytest.fixture(scope='session')
+def bench_results():
+    results = {}
+    yield results
+    if ENABLED and UPDATE and results:
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        baseline.update(results)
+        BASELINE.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + '\n')
+
+
+@pytest.fixture
+def bench(request, bench_results):
+    baseline = json.loads(BASELINE.read_text()) if ENABLED and BASELINE.exists() else {}
+    return Bench(request.node.callspec.id, baseline, bench_results)
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    for scope in ('checkout', 'cart', 'token', 'catalog_anon'):
+        monkeypatch.setitem(TokenBucketThrottle.THROTTLE_RATES, scope, '1000000/s')
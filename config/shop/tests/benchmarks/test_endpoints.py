@@ -0,0 +1,365 @@
+import itertools
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from shop import urls
+from shop.analytics import record_sales
+from shop.models import Cart, CartItem, Category, CheckoutJob, Order, OrderItem, Product
+
+pytestmark = pytest.mark.django_db
+
+METHODS = ('get', 'post', 'put', 'patch', 'delete')
+LINES = ('lines', (1, 10, 100))
+ORDERS = ('orders', (10, 1000))
+PRODUCTS = ('products', (10, 1000))
+CATEGORIES = ('categories', (10, 1000))
+ONCE = (None, (None,))
+# (route, method) -> (dataset, query budget, expected status, builder). The
+# budget is the same for every size: a query that scales with the dataset
+# is an N+1 and fails the smallest size that exposes it.
+CASES = {}
+serial = itertools.count()
+
+
+def case(route, method, dataset=ONCE, budget=None, status=200):
+    def register(builder):
+        CASES[(route, method)] = (dataset, budget, status, builder)
+        return builder
+    return register
+
+
+def endpoints():
+    for pattern in urls.urlpatterns:
+        for method in METHODS:
+            if hasattr(pattern.callback.cls, method):
+                yield str(pattern.pattern), method
+
+
+def params():
+    for route, method in endpoints():
+        if (route, method) not in CASES:
+            continue
+        (name, sizes), *_ = CASES[(route, method)]
+        for size in sizes:
+            label = f'{method} {route}' + (f' {name}={size}' if name else '')
+            yield pytest.param(route, method, size, id=label)
+
+
+@pytest.fixture
+def world(auth_client, user, product_factory):
+    staff = get_user_model().objects.create_user(username='staff', is_staff=True)
+    staff_client = APIClient()
+    staff_client.force_authenticate(staff)
+    seed = product_factory(stock=10**6, price=10, is_active=True)
+    return {'client': auth_client, 'staff': staff_client, 'anon': APIClient(), 'user': user,
+            'category': seed.category, 'products': [seed]}
+
+
+def analyze(*models):
+    # Fresh rows, and rows rolled back by earlier tests, leave the planner
+    # with stale statistics; large cases would be timed on the wrong plans.
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE ' + ', '.join(model._meta.db_table for model in models))
+
+
+def products(world, count):
+    missing = count - len(world['products'])
+    if missing > 0:
+        world['products'] += Product.objects.bulk_create(
+            Product(category=world['category'], name=f'Bench {n}', slug=f'bench-{next(serial)}',
+                    price=10 + n % 90, stock=10**6, is_active=True)
+            for n in range(missing))
+        analyze(Product)
+    return world['products'][:count]
+
+
+def fill_cart(world, lines):
+    cart, _ = Cart.objects.get_or_create(user=world['user'])
+    cart.items.all().delete()
+    CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=1)
+                                 for product in products(world, lines))
+    return cart
+
+
+def orders(world, count, lines=3):
+    items = products(world, lines)
+    created = Order.objects.bulk_create(Order(user=world['user'], total_price=10 * lines) for _ in range(count))
+    OrderItem.objects.bulk_create(OrderItem(order=order, product=product, category_id=product.category_id,
+                                            quantity=1, price=10)
+                                  for order in created for product in items)
+    analyze(Order, OrderItem)
+    record_sales([order.pk for order in created], Order.Status.NEW)
+    return created
+
+
+def read(client, path):
+    return lambda: lambda: client.get(path)
+
+
+def cold(world, path):
+    # Anonymous catalog reads are cached; time the database path.
+    def prepare():
+        caches['catalog'].clear()
+        return lambda: world['anon'].get(path)
+    return prepare
+
+
+def product_payload(world):
+    return {'name': 'Bench', 'slug': f'bench-new-{next(serial)}', 'category': world['category'].pk,
+            'price': '9.99', 'stock': 5}
+
+
+@case('api/products/', 'get', PRODUCTS, budget=2)
+def product_list(world, size):
+    products(world, size)
+    return cold(world, '/api/products/?ordering=-price&page_size=100')
+
+
+@case('api/products/', 'post', budget=6, status=201)
+def product_create(world, size):
+    return lambda: lambda: world['staff'].post('/api/products/', product_payload(world), format='json')
+
+
+@case('api/products/<int:pk>/', 'get', budget=1)
+def product_detail(world, size):
+    return cold(world, f'/api/products/{world["products"][0].pk}/')
+
+
+@case('api/products/<int:pk>/', 'put', budget=7)
+def product_put(world, size):
+    pk = world['products'][0].pk
+    return lambda: lambda: world['staff'].put(f'/api/products/{pk}/', {**product_payload(world), 'stock': 10**6}, format='json')
+
+
+@case('api/products/<int:pk>/', 'patch', budget=5)
+def product_patch(world, size):
+    pk = world['products'][0].pk
+    return lambda: lambda: world['staff'].patch(f'/api/products/{pk}/', {'stock': 10**6}, format='json')
+
+
+@case('api/products/<int:pk>/', 'delete', budget=7, status=204)
+def product_delete(world, size):
+    def prepare():
+        pk = Product.objects.create(category=world['category'], name='Gone', slug=f'gone-{next(serial)}', price=1).pk
+        return lambda: world['staff'].delete(f'/api/products/{pk}/')
+    return prepare
+
+
+@case('api/categories/', 'get', CATEGORIES, budget=2)
+def category_list(world, size):
+    Category.objects.bulk_create(Category(name=f'Bench {n}', slug=f'bench-cat-{next(serial)}') for n in range(size))
+    return cold(world, '/api/categories/')
+
+
+@case('api/categories/', 'post', budget=4, status=201)
+def category_create(world, size):
+    return lambda: lambda: world['staff'].post('/api/categories/', {'name': 'Bench', 'slug': f'cat-{next(serial)}'}, format='json')
+
+
+@case('api/categories/<int:pk>/', 'get', budget=1)
+def category_detail(world, size):
+    return cold(world, f'/api/categories/{world["category"].pk}/')
+
+
+@case('api/categories/<int:pk>/', 'put', budget=5)
+def category_put(world, size):
+    pk = world['category'].pk
+    return lambda: lambda: world['staff'].put(f'/api/categories/{pk}/', {'name': 'Bench', 'slug': f'cat-{next(serial)}'}, format='json')
+
+
+@case('api/categories/<int:pk>/', 'patch', budget=4)
+def category_patch(world, size):
+    pk = world['category'].pk
+    return lambda: lambda: world['staff'].patch(f'/api/categories/{pk}/', {'name': 'Bench'}, format='json')
+
+
+@case('api/categories/<int:pk>/', 'delete', budget=8, status=204)
+def category_delete(world, size):
+    def prepare():
+        category = Category.objects.create(name='Gone', slug=f'gone-cat-{next(serial)}')
+        return lambda: world['staff'].delete(f'/api/categories/{category.pk}/')
+    return prepare
+
+
+@case('api/health/ready/', 'get', budget=1)
+def readiness(world, size):
+    return read(world['anon'], '/api/health/ready/')
+
+
+@case('metrics', 'get', budget=0)
+def metrics(world, size):
+    return read(world['staff'], '/metrics')
+
+
+@case('api/catalog/cache/', 'get', budget=0)
+def catalog_cache_stats(world, size):
+    return read(world['staff'], '/api/catalog/cache/')
+
+
+@case('api/catalog/import/<str:kind>/', 'post', PRODUCTS, budget=7)
+def catalog_import(world, size):
+    slug = world['category'].slug
+    body = 'slug,name,category,price,stock\n' + ''.join(
+        f'import-{n},Imported {n},{slug},{n % 50 + 1},5\n' for n in range(size))
+    return lambda: lambda: world['staff'].generic('POST', '/api/catalog/import/product/', body, content_type='text/csv')
+
+
+@case('api/catalog/export/<str:kind>/', 'get', PRODUCTS, budget=1)
+def catalog_export(world, size):
+    products(world, size)
+
+    def send():
+        response = world['staff'].get('/api/catalog/export/product/')
+        b''.join(response.streaming_content)
+        return response
+    return lambda: send
+
+
+@case('api/cart/', 'get', LINES, budget=3)
+def cart_detail(world, size):
+    fill_cart(world, size)
+    return read(world['client'], '/api/cart/')
+
+
+@case('api/cart/items/', 'post', LINES, budget=6, status=201)
+def cart_item_create(world, size):
+    def prepare():
+        fill_cart(world, size - 1)
+        product = products(world, size)[-1]
+        return lambda: world['client'].post('/api/cart/items/', {'product': product.pk, 'quantity': 1}, format='json')
+    return prepare
+
+
+@case('api/cart/items/batch/', 'post', LINES, budget=10)
+def cart_batch(world, size):
+    operations = [{'op': 'add', 'product': product.pk, 'quantity': 1} for product in products(world, size)]
+
+    def prepare():
+        fill_cart(world, 0)
+        return lambda: world['client'].post('/api/cart/items/batch/', {'operations': operations}, format='json')
+    return prepare
+
+
+@case('api/cart/items/<int:pk>/', 'patch', LINES, budget=6)
+def cart_item_update(world, size):
+    item = fill_cart(world, size).items.order_by('pk').last()
+    quantities = itertools.cycle((2, 3))
+    return lambda: lambda: world['client'].patch(f'/api/cart/items/{item.pk}/', {'quantity': next(quantities)}, format='json')
+
+
+@case('api/orders/checkout/', 'post', LINES, budget=13, status=201)
+def checkout(world, size):
+    def prepare():
+        fill_cart(world, size)
+        return lambda: world['client'].post('/api/orders/checkout/', {}, format='json')
+    return prepare
+
+
+@case('api/orders/checkout/async/', 'post', LINES, budget=7, status=202)
+def checkout_async(world, size):
+    def prepare():
+        CheckoutJob.objects.filter(user=world['user']).delete()
+        fill_cart(world, size)
+        return lambda: world['client'].post('/api/orders/checkout/async/', {}, format='json')
+    return prepare
+
+
+@case('api/orders/checkout/jobs/<int:pk>/', 'get', LINES, budget=3)
+def checkout_job(world, size):
+    order = orders(world, 1, lines=size)[0]
+    job = CheckoutJob.objects.create(user=world['user'], items=[], status=CheckoutJob.Status.DONE, order=order)
+    return read(world['client'], f'/api/orders/checkout/jobs/{job.pk}/')
+
+
+@case('api/orders/<int:pk>/', 'get', LINES, budget=3)
+def order_detail(world, size):
+    order = orders(world, 1, lines=size)[0]
+    return read(world['client'], f'/api/orders/{order.pk}/')
+
+
+@case('api/orders/', 'get', ORDERS, budget=3)
+def order_list(world, size):
+    orders(world, size)
+    return read(world['client'], '/api/orders/')
+
+
+@case('api/orders/cancel/', 'post', ORDERS, budget=10)
+def order_batch_cancel(world, size):
+    def prepare():
+        ids = [order.pk for order in orders(world, size)]
+        return lambda: world['staff'].post('/api/orders/cancel/', {'ids': ids}, format='json')
+    return prepare
+
+
+@case('api/orders/<int:pk>/pay/', 'post', LINES, budget=9)
+def order_pay(world, size):
+    def prepare():
+        pk = orders(world, 1, lines=size)[0].pk
+        return lambda: world['client'].post(f'/api/orders/{pk}/pay/', {}, format='json')
+    return prepare
+
+
+@case('api/orders/<int:pk>/cancel/', 'post', LINES, budget=12)
+def order_cancel(world, size):
+    def prepare():
+        pk = orders(world, 1, lines=size)[0].pk
+        return lambda: world['client'].post(f'/api/orders/{pk}/cancel/', {}, format='json')
+    return prepare
+
+
+@case('api/analytics/sales/', 'get', ORDERS, budget=1)
+def analytics_sales(world, size):
+    orders(world, size)
+    return read(world['staff'], '/api/analytics/sales/?status=NEW')
+
+
+@case('api/analytics/top/products/', 'get', ORDERS, budget=1)
+def analytics_top_products(world, size):
+    orders(world, size)
+    return read(world['staff'], '/api/analytics/top/products/?status=NEW')
+
+
+@case('api/analytics/top/categories/', 'get', ORDERS, budget=1)
+def analytics_top_categories(world, size):
+    orders(world, size)
+    return read(world['staff'], '/api/analytics/top/categories/?status=NEW')
+
+
+@case('api/token/', 'post', budget=1)
+def token_obtain(world, size):
+    payload = {'username': 'testuser', 'password': 'password12345'}
+    return read_post(world['anon'], '/api/token/', payload)
+
+
+@case('api/token/refresh/', 'post', budget=1)
+def token_refresh(world, size):
+    return read_post(world['anon'], '/api/token/refresh/', {'refresh': str(RefreshToken.for_user(world['user']))})
+
+
+@case('api/token/verify/', 'post', budget=0)
+def token_verify(world, size):
+    token = str(RefreshToken.for_user(world['user']).access_token)
+    return read_post(world['anon'], '/api/token/verify/', {'token': token})
+
+
+def read_post(client, path, payload):
+    return lambda: lambda: client.post(path, payload, format='json')
+
+
+def test_every_endpoint_has_a_case():
+    assert set(endpoints()) - set(CASES) == set()
+    assert set(CASES) - set(endpoints()) == set()
+
+
+@pytest.mark.parametrize('route,method,size', list(params()))
+def test_endpoint(world, route, method, size, bench, django_assert_max_num_queries):
+    _, budget, status, builder = CASES[(route, method)]
+    prepare = builder(world, size)
+    send = prepare()
+    with django_assert_max_num_queries(budget) as captured:
+        response = send()
+    assert response.status_code == status, response.content
+    bench(prepare, len(captured))
@@ -0,0 +1,121 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.test import APIClient
+from shop.analytics import rebuild_sales
+from shop.models import Cart, CartItem, CategorySales, DailySales, ProductSales
+from shop.services import enqueue_checkout, process_checkout_jobs
+
+pytestmark = pytest.mark.django_db
+
+
+def _snapshot():
+    # Incremental updates leave zeroed rows behind where a rebuild has none.
+    return {
+        model.__name__: sorted(model.objects.exclude(units=0).values_list(*fields, 'status', 'revenue', 'units', 'orders'))
+        for model, fields in ((DailySales, ('day',)), (CategorySales, ('day', 'category')),
+                              (ProductSales, ('day', 'product', 'category')))
+    }
+
+
+def _checkout(client, user, lines):
+    cart,_ = Cart.objects.get_or_create(user=user)
+    for product, quantity in lines:
+        CartItem.objects.create(cart=cart,product=product,quantity=quantity)
+    response = client.post('/api/orders/checkout/',{},format='json')
+    assert response.status_code == 201
+    return response.json()['id']
+
+
+@pytest.fixture
+def staff_client():
+    client = APIClient()
+    client.force_authenticate(get_user_model().objects.create_user(username='staff',password='x',is_staff=True))
+    return client
+
+
+def test_rollups_follow_checkout_pay_and_cancel(auth_client,user,product_factory,staff_client):
+    phone, laptop = product_factory(stock=50,price=10), product_factory(stock=50,price=100)
+    paid = _checkout(auth_client,user,[(phone,2),(laptop,1)])
+    cancelled = _checkout(auth_client,user,[(phone,1)])
+    batch_cancelled = _checkout(auth_client,user,[(laptop,3)])
+    _checkout(auth_client,user,[(phone,4)])
+    assert auth_client.post(f'/api/orders/{paid}/pay/').status_code == 200
+    assert auth_client.post(f'/api/orders/{cancelled}/cancel/').status_code == 200
+    assert staff_client.post('/api/orders/cancel/',{'ids':[batch_cancelled]},format='json').status_code == 200
+    other = get_user_model().objects.create_user(username='other',password='x')
+    CartItem.objects.create(cart=Cart.objects.create(user=other),product=phone,quantity=5)
+    enqueue_checkout(other)
+    process_checkout_jobs()
+
+    today = timezone.localdate()
+    daily = {row.status: (row.revenue, row.units, row.orders) for row in DailySales.objects.filter(day=today)}
+    assert daily == {'NEW': (90, 9, 2), 'PAID': (120, 3, 1), 'CANCELLED': (310, 4, 2)}
+    phone_new = ProductSales.objects.get(day=today,product=phone,status='NEW')
+    assert (phone_new.units, phone_new.orders, phone_new.category_id) == (9, 2, phone.category_id)
+    incremental = _snapshot()
+    rebuild_sales()
+    assert _snapshot() == incremental
+
+
+def test_rollups_keep_lines_in_the_category_they_were_sold_in(auth_client,user,product_factory):
+    product = product_factory(stock=10,price=5)
+    old_category = product.category
+    before = _checkout(auth_client,user,[(product,2)])
+    product.category = baker.make('shop.Category')
+    product.save()
+    after = _checkout(auth_client,user,[(product,1)])
+    assert auth_client.post(f'/api/orders/{before}/cancel/').status_code == 200
+    assert auth_client.post(f'/api/orders/{after}/pay/').status_code == 200
+    sales = {(row.category_id,row.status): row.units for row in CategorySales.objects.exclude(units=0)}
+    assert sales == {(old_category.pk,'CANCELLED'): 2,(product.category_id,'PAID'): 1}
+    assert not CategorySales.objects.filter(units__lt=0).exists()
+    incremental = _snapshot()
+    rebuild_sales()
+    assert _snapshot() == incremental
+
+
+def test_rebuild_command_recovers_from_drift(auth_client,user,product_factory):
+    product = product_factory(stock=10,price=5)
+    _checkout(auth_client,user,[(product,2)])
+    DailySales.objects.update(units=999)
+    ProductSales.objects.all().delete()
+    call_command('rebuild_sales_rollups')
+    assert DailySales.objects.get().units == 2
+    assert ProductSales.objects.get().revenue == 10
+
+
+def test_sales_report_and_top_n(auth_client,user,product_factory,staff_client):
+    phone, laptop = product_factory(stock=50,price=10), product_factory(stock=50,price=100)
+    for lines in ([(phone,5)],[(phone,1),(laptop,1)]):
+        order = _checkout(auth_client,user,lines)
+        auth_client.post(f'/api/orders/{order}/pay/')
+    today = timezone.localdate().isoformat()
+
+    report = staff_client.get('/api/analytics/sales/').json()
+    assert report['status'] == 'PAID'
+    assert report['results'] == [{'revenue':'160.00','units':7,'orders':2,'day':today}]
+    assert report['total'] == {'revenue':'160.00','units':7,'orders':2}
+    report = staff_client.get(f'/api/analytics/sales/?product={laptop.pk}&start={today}&end={today}').json()
+    assert report['total'] == {'revenue':'100.00','units':1,'orders':1}
+    assert staff_client.get('/api/analytics/sales/?status=CANCELLED').json()['results'] == []
+
+    top = staff_client.get('/api/analytics/top/products/?by=units&limit=1').json()
+    assert top['results'] == [{'revenue':'60.00','units':6,'orders':2,'product':phone.pk,'name':phone.name}]
+    top = staff_client.get('/api/analytics/top/products/').json()
+    assert [row['product'] for row in top['results']] == [laptop.pk,phone.pk]
+    top = staff_client.get(f'/api/analytics/top/categories/?category={phone.category_id}').json()
+    assert [row['category'] for row in top['results']] == [phone.category_id]
+
+
+def test_analytics_is_staff_only_and_validates(auth_client,staff_client):
+    assert auth_client.get('/api/analytics/sales/').status_code == 401
+    assert auth_client.get('/api/analytics/top/products/').status_code == 401
+    response = staff_client.get('/api/analytics/sales/?start=2026-02-01&end=2026-01-01')
+    assert response.status_code == 400
+    assert response.json()['key'] == 'start'
+    response = staff_client.get('/api/analytics/top/categories/?limit=500')
+    assert response.status_code == 400
+    assert response.json()['key'] == 'limit'
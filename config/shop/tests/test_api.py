@@ -1,3 +1,48 @@
-from django.test import TestCase
+import pytest
+from django.core.management import call_command
 
-# Create your tests here.
+
+@pytest.mark.django_db
+def test_readiness_probe(api_client):
+    response = api_client.get('/api/health/ready/')
+    assert response.status_code == 200
+    assert response.json() == {'status':'ready'}
+
+
+@pytest.mark.django_db
+def test_wait_for_db_returns_once_connected(capsys):
+    call_command('wait_for_db','--timeout','5')
+    assert 'Database is ready.' in capsys.readouterr().out
+
+
+def test_orjson_renderer_matches_drf_renderer():
+    import datetime
+    import uuid
+    from decimal import Decimal
+    from django.utils.translation import gettext_lazy
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+    from shop.renderers import ORJSONRenderer
+    payload = ReturnDict({
+        'price': Decimal('19.90'),
+        'total': Decimal('20'),
+        'created_at': datetime.datetime(2025,1,2,3,4,5,678901,tzinfo=datetime.timezone.utc),
+        'day': datetime.date(2025,1,2),
+        'id': uuid.UUID(int=7),
+        'name': 'Caf\u00e9 line\u2028sep\u2029',
+        'detail': gettext_lazy('Not found.'),
+        'items': ReturnList([{'id':1,'quantity':2}],serializer=None),
+        3: None,
+    },serializer=None)
+    assert ORJSONRenderer().render(payload) == JSONRenderer().render(payload)
+    assert ORJSONRenderer().render({'n':2**70}) == JSONRenderer().render({'n':2**70})
+    assert ORJSONRenderer().render(payload,'application/json; indent=4') == JSONRenderer().render(payload,'application/json; indent=4')
+
+
+@pytest.mark.django_db
+def test_json_errors_render_as_before(auth_client):
+    response = auth_client.post('/api/cart/items/','{"product": ',content_type='application/json')
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith('JSON parse error - ')
+    response = auth_client.post('/api/orders/checkout/',{},format='json')
+    assert response.content == b'{"detail":"Cart is empty.","key":"cart"}'
@@ -0,0 +1,82 @@
+import pytest
+from shop.models import Cart, Category, Order
+
+pytestmark = pytest.mark.django_db
+
+
+def test_async_product_detail_matches_sync(api_client,product_factory):
+    product = product_factory(price=12.5,stock=3)
+    sync = api_client.get(f'/api/products/{product.pk}/')
+    response = api_client.get(f'/api/async/products/{product.pk}/')
+    assert response.status_code == 200
+    assert response.content == sync.content
+    # the detail cache is shared with the sync view
+    assert response['X-Cache'] == 'HIT'
+
+
+def test_async_product_list_filters_and_cursor(api_client,product_factory):
+    products = [product_factory(is_active=True,price=price) for price in (5,30,20)]
+    product_factory(is_active=False)
+    first = api_client.get('/api/async/products/?pagination=cursor&is_active=true&ordering=-price&page_size=2').json()
+    assert [row['id'] for row in first['results']] == [products[1].pk,products[2].pk]
+    second = api_client.get(first['next']).json()
+    assert [row['id'] for row in second['results']] == [products[0].pk]
+    assert second['next'] is None
+    response = api_client.get('/api/async/products/?is_active=maybe')
+    assert response.status_code == 400
+    assert response.json()['key'] == 'is_active'
+
+
+@pytest.mark.parametrize('query',['?page=2','?page=2&exact_count=true&ordering=-price','?pagination=cursor&page_size=4',
+                                   '?search=Product','?page=9'])
+def test_async_product_list_pages_like_sync(api_client,product_factory,query):
+    for n in range(12):
+        product_factory(name=f'Product {n}',price=n+1)
+    sync = api_client.get('/api/products/'+query)
+    response = api_client.get('/api/async/products/'+query)
+    assert response.status_code == sync.status_code
+    assert response.content.replace(b'/api/async/',b'/api/') == sync.content
+
+
+def test_async_category_list_pages_like_sync(api_client):
+    Category.objects.bulk_create(Category(name=f'Category {n}',slug=f'category-{n}') for n in range(12))
+    for query in ('','?page=2&ordering=-name'):
+        sync = api_client.get('/api/categories/'+query)
+        response = api_client.get('/api/async/categories/'+query)
+        assert response.json()['count'] == 12
+        assert response.content.replace(b'/api/async/',b'/api/') == sync.content
+
+
+def test_async_cart_requires_auth(api_client):
+    response = api_client.get('/api/async/cart/')
+    assert response.status_code == 401
+    assert response.json()['key'] == 'auth'
+    assert api_client.get('/api/async/cart/',HTTP_AUTHORIZATION='Bearer junk').status_code == 401
+
+
+def test_async_cart_matches_sync(auth_client,product_factory):
+    product = product_factory(stock=5,price=10)
+    auth_client.post('/api/cart/items/',{'product':product.pk,'quantity':2},format='json')
+    response = auth_client.get('/api/async/cart/')
+    assert response.status_code == 200
+    assert response.content == auth_client.get('/api/cart/').content
+    assert response.json()['total'] == 20
+
+
+def test_async_cart_is_created_for_a_user_without_one(auth_client,user):
+    response = auth_client.get('/api/async/cart/')
+    assert response.status_code == 200
+    assert response.json()['items'] == []
+    assert Cart.objects.filter(user=user).count() == 1
+    assert response.content == auth_client.get('/api/cart/').content
+
+
+def test_async_order_detail_is_scoped_to_owner(auth_client,user,django_user_model):
+    mine = Order.objects.create(user=user,total_price=5)
+    other = Order.objects.create(user=django_user_model.objects.create_user(username='other',password='x'),total_price=5)
+    response = auth_client.get(f'/api/async/orders/{mine.pk}/')
+    assert response.status_code == 200
+    assert response.content == auth_client.get(f'/api/orders/{mine.pk}/').content
+    response = auth_client.get(f'/api/async/orders/{other.pk}/')
+    assert response.status_code == 404
+    assert response.json()['key'] == 'object'
@@ -0,0 +1,38 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def _user_queries(ctx):
+    return [q for q in ctx.captured_queries if 'auth_user' in q['sql']]
+
+
+@pytest.mark.django_db
+def test_authenticated_user_is_cached(auth_client):
+    with CaptureQueriesContext(connection) as first:
+        assert auth_client.get('/api/cart/').status_code == 200
+    with CaptureQueriesContext(connection) as second:
+        assert auth_client.get('/api/cart/').status_code == 200
+    assert len(_user_queries(first)) == 1
+    assert len(_user_queries(second)) == 0
+
+
+@pytest.mark.django_db
+def test_deactivated_user_rejected_despite_cache(auth_client,user):
+    assert auth_client.get('/api/cart/').status_code == 200
+    user.is_active = False
+    user.save()
+    assert auth_client.get('/api/cart/').status_code == 401
+
+
+@pytest.mark.django_db
+def test_user_save_invalidates_cache(auth_client,user):
+    assert auth_client.get('/api/cart/').status_code == 200
+    user.set_password('another-password-1')
+    user.save()
+    with CaptureQueriesContext(connection) as ctx:
+        assert auth_client.get('/api/cart/').status_code == 200
+    assert len(_user_queries(ctx)) == 1
+    get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+    assert auth_client.get('/api/cart/').status_code == 200
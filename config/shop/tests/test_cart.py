@@ -1,5 +1,7 @@
 import pytest
-from shop.models import CartItem
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from shop.models import Cart, CartItem
 @pytest.mark.django_db
 def test_no_auth_client_cart(product_factory,api_client):
     response = api_client.post('/api/cart/items/')
@@ -40,3 +42,63 @@ def test_auth_client_cart_cart_get(auth_client,product_factory):
     first_item = data['items'][0]
     assert 'product' in first_item
     assert 'quantity' in first_item
+@pytest.mark.django_db
+def test_cart_get_query_count_is_constant(auth_client,product_factory,user,django_assert_num_queries):
+    cart,_ = Cart.objects.get_or_create(user=user)
+    response = auth_client.get('/api/cart/')
+    assert response.json()['total'] == 0
+    for price in (10,20,30,40,50):
+        CartItem.objects.create(cart=cart,product=product_factory(price=price,stock=10),quantity=2)
+    with CaptureQueriesContext(connection) as small:
+        auth_client.get('/api/cart/')
+    for _ in range(20):
+        CartItem.objects.create(cart=cart,product=product_factory(price=1,stock=10),quantity=1)
+    with django_assert_num_queries(len(small.captured_queries)):
+        response = auth_client.get('/api/cart/')
+    data = response.json()
+    assert len(data['items']) == 25
+    assert data['items'][0]['subtotal'] == 20
+    assert data['total'] == 2*(10+20+30+40+50) + 20
+@pytest.mark.django_db
+def test_cart_add_merges_into_existing_line(auth_client,product_factory,user):
+    product = product_factory(stock=5)
+    response = auth_client.post('/api/cart/items/',{'product':product.id,'quantity':2},format='json')
+    assert response.status_code == 201
+    response = auth_client.post('/api/cart/items/',{'product':product.id,'quantity':3},format='json')
+    assert response.status_code == 200
+    assert response.json()['quantity'] == 5
+    assert CartItem.objects.filter(cart__user=user,product=product).count() == 1
+    response = auth_client.post('/api/cart/items/',{'product':product.id,'quantity':1},format='json')
+    assert response.status_code == 400
+    assert response.json() == {'detail':'Only 5 items in stock.','key':'quantity'}
+    assert CartItem.objects.get(cart__user=user,product=product).quantity == 5
+@pytest.mark.django_db
+def test_cart_batch_operations(auth_client,product_factory,user):
+    keep,bump,drop = [product_factory(stock=10,price=5) for _ in range(3)]
+    cart,_ = Cart.objects.get_or_create(user=user)
+    CartItem.objects.create(cart=cart,product=bump,quantity=1)
+    CartItem.objects.create(cart=cart,product=drop,quantity=1)
+    operations = [
+        {'op':'add','product':keep.id,'quantity':2},
+        {'op':'add','product':bump.id,'quantity':2},
+        {'op':'update','product':keep.id,'quantity':4},
+        {'op':'remove','product':drop.id},
+    ]
+    response = auth_client.post('/api/cart/items/batch/',{'operations':operations},format='json')
+    assert response.status_code == 200
+    data = response.json()
+    assert {item['product']:item['quantity'] for item in data['items']} == {keep.id:4,bump.id:3}
+    assert data['total'] == 35
+@pytest.mark.django_db
+def test_cart_batch_reports_failing_operation(auth_client,product_factory,user):
+    product = product_factory(stock=3)
+    operations = [
+        {'op':'add','product':product.id,'quantity':2},
+        {'op':'add','product':product.id,'quantity':2},
+    ]
+    response = auth_client.post('/api/cart/items/batch/',{'operations':operations},format='json')
+    assert response.status_code == 400
+    assert response.json() == {'detail':'Not enough in stock.','key':'quantity','available':3,'index':1}
+    assert not CartItem.objects.filter(cart__user=user).exists()
+    response = auth_client.post('/api/cart/items/batch/',{'operations':[{'op':'add','product':product.id}]},format='json')
+    assert response.json() == {'detail':'Quantity must be at least 1.','key':'quantity','index':0}
@@ -0,0 +1,68 @@
+import json
+import pytest
+from django.contrib.auth import get_user_model
+from shop.models import Category, Product
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def staff_client(api_client,db):
+    staff = get_user_model().objects.create_user(username='staff',password='password12345',is_staff=True)
+    api_client.force_authenticate(staff)
+    return api_client
+
+
+def test_import_requires_staff(auth_client):
+    response = auth_client.post('/api/catalog/import/category/','slug,name\nphones,Phones\n',content_type='text/csv')
+    assert response.status_code == 401
+
+
+def test_import_upserts_by_slug(staff_client,product_factory):
+    csv_body = 'slug,name\nphones,Phones\nlaptops,Laptops\n'
+    response = staff_client.post('/api/catalog/import/category/',csv_body,content_type='text/csv')
+    assert response.json() == {'rows':2,'created':2,'updated':0}
+    existing = product_factory(slug='macbook',name='Old name',stock=1)
+    lines = [
+        {'slug':'macbook','name':'Macbook Air','category':'laptops','price':'999.90','stock':5},
+        {'slug':'pixel','name':'Pixel','category':'phones','price':'499','stock':7,'is_active':False},
+        {'slug':'pixel','name':'Pixel 9','category':'phones','price':'599','stock':3},
+    ]
+    body = '\n'.join(json.dumps(line) for line in lines)
+    response = staff_client.post('/api/catalog/import/product/',body,content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.json() == {'rows':3,'created':1,'updated':1}
+    existing.refresh_from_db()
+    assert existing.name == 'Macbook Air'
+    assert existing.category.slug == 'laptops'
+    assert existing.stock == 5
+    pixel = Product.objects.get(slug='pixel')
+    assert pixel.name == 'Pixel 9' and pixel.is_active
+    assert staff_client.get('/api/products/?search=pixel').json()['results'][0]['slug'] == 'pixel'
+
+
+def test_import_reports_failing_row(staff_client):
+    Category.objects.create(name='Phones',slug='phones')
+    body = 'slug,name,category,price,stock\npixel,Pixel,phones,10,1\nbad,Bad,phones,-1,1\n'
+    response = staff_client.post('/api/catalog/import/product/',body,content_type='text/csv')
+    assert response.status_code == 400
+    assert response.json()['key'] == 'price'
+    assert response.json()['row'] == 2
+    body = 'slug,name,category,price,stock\npixel,Pixel,tablets,10,1\n'
+    response = staff_client.post('/api/catalog/import/product/',body,content_type='text/csv')
+    assert response.json() == {'detail':'Category not found.','key':'category','row':1}
+    assert not Product.objects.exists()
+
+
+def test_export_streams_catalog(staff_client,product_factory):
+    products = product_factory(_quantity=3,price=12)
+    response = staff_client.get('/api/catalog/export/product/?type=ndjson')
+    assert response.status_code == 200
+    assert response.streaming
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert [row['slug'] for row in rows] == [p.slug for p in products]
+    assert rows[0]['price'] == '12.00'
+    response = staff_client.get('/api/catalog/export/product/')
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert lines[0] == 'slug,name,category,price,stock,is_active'
+    assert len(lines) == 4
@@ -0,0 +1,37 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from shop.models import Category, Order, Product
+
+
+@pytest.fixture
+def seeded(db):
+    categories = Category.objects.bulk_create(
+        Category(name=f'Category {i}', slug=f'category-{i}') for i in range(50)
+    )
+    Product.objects.bulk_create(
+        Product(category=categories[i % 50], name=f'Product {i}', slug=f'product-{i}',
+                price=i % 997, stock=10, is_active=i % 4 != 0)
+        for i in range(10000)
+    )
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(username=f'user-{i}') for i in range(100)
+    )
+    Order.objects.bulk_create(Order(user=users[i % 100]) for i in range(10000))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE shop_product')
+        cursor.execute('ANALYZE shop_order')
+    return categories[7], users[3]
+
+
+def test_catalog_list_uses_partial_index(seeded):
+    category,_ = seeded
+    plan = (Product.objects.filter(category=category, is_active=True)
+            .order_by('price', 'id')[:10].explain())
+    assert 'product_active_cat_price_idx' in plan
+
+
+def test_order_list_uses_user_created_index(seeded):
+    _,user = seeded
+    plan = Order.objects.filter(user=user).order_by('-created_at', '-id')[:11].explain()
+    assert 'order_user_created_idx' in plan
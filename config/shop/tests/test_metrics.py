@@ -0,0 +1,113 @@
+import re
+import time
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.test import AsyncClient
+from shop import metrics
+from shop.metrics import metrics_cache
+from shop.middleware import MetricsMiddleware
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def fresh_recorder(settings, monkeypatch):
+    settings.METRICS_FLUSH_INTERVAL = 0
+    monkeypatch.setattr(metrics, 'recorder', metrics.Recorder())
+    monkeypatch.setattr('shop.middleware.recorder', metrics.recorder)
+
+
+def _sample(text, line):
+    match = re.search('^' + re.escape(line) + r' (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_server_timing_header(auth_client):
+    response = auth_client.get('/api/cart/')
+    timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+    assert set(timing) == {'app', 'db', 'serialize'}
+    assert re.fullmatch(r'dur=[\d.]+;desc="\d+ queries"', timing['db'])
+    assert int(re.search(r'(\d+) queries', timing['db']).group(1)) > 0
+
+
+def test_metrics_endpoint_aggregates_per_view(auth_client, api_client, django_user_model):
+    for _ in range(3):
+        auth_client.get('/api/cart/')
+    auth_client.get('/api/nowhere/')
+    assert auth_client.get('/metrics').status_code == 401
+    staff = django_user_model.objects.create_user(username='staff', password='x', is_staff=True)
+    scraper = type(api_client)()
+    scraper.force_authenticate(staff)
+    response = scraper.get('/metrics')
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.content.decode()
+    assert '# TYPE shop_request_duration_seconds histogram' in text
+    assert _sample(text, 'shop_request_duration_seconds_count{view="cart-detail"}') == 3
+    assert _sample(text, 'shop_request_duration_seconds_bucket{view="cart-detail",le="+Inf"}') == 3
+    assert _sample(text, 'shop_db_queries_count{view="cart-detail"}') == 3
+    assert _sample(text, 'shop_db_queries_sum{view="cart-detail"}') >= 3
+    assert _sample(text, 'shop_request_duration_seconds_count{view="unmatched"}') == 1
+    buckets = re.findall(r'^shop_request_duration_seconds_bucket\{view="cart-detail",le="[^"]+"\} (\d+)$', text, re.M)
+    assert [int(count) for count in buckets] == sorted(int(count) for count in buckets)
+
+
+def test_workers_add_into_the_shared_store():
+    first, second = metrics.Recorder(), metrics.Recorder()
+    first.observe('order-checkout', {'request_duration_seconds': 0.02, 'db_queries': 7})
+    second.observe('order-checkout', {'request_duration_seconds': 0.3, 'db_queries': 9})
+    assert metrics.render_metrics().count('view="order-checkout"') == 0
+    first.flush()
+    second.flush()
+    text = metrics.render_metrics()
+    assert _sample(text, 'shop_request_duration_seconds_count{view="order-checkout"}') == 2
+    assert _sample(text, 'shop_request_duration_seconds_bucket{view="order-checkout",le="0.025"}') == 1
+    assert _sample(text, 'shop_request_duration_seconds_sum{view="order-checkout"}') == pytest.approx(0.32)
+    assert _sample(text, 'shop_db_queries_sum{view="order-checkout"}') == 16
+    assert text.count('view="order-checkout",le="+Inf"') == 2
+
+
+def test_idle_worker_flushes_on_a_timer_and_at_exit(settings, monkeypatch):
+    settings.METRICS_FLUSH_INTERVAL = 0.2
+    exit_hooks = []
+    monkeypatch.setattr(metrics.atexit, 'register', exit_hooks.append)
+    worker = metrics.Recorder()
+    worker.observe('cart-detail', {'db_queries': 3})
+    assert worker.pending
+    deadline = time.monotonic() + 5
+    while worker.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert exit_hooks == [worker.flush]
+    assert _sample(metrics.render_metrics(), 'shop_db_queries_sum{view="cart-detail"}') == 3
+    settings.METRICS_FLUSH_INTERVAL = 0
+
+
+@pytest.mark.django_db(databases=['default','cache'])
+def test_async_requests_never_write_to_the_database_cache(settings, product_factory, monkeypatch):
+    settings.CACHES = {**settings.CACHES, 'metrics': {'BACKEND': 'shop.cache.SharedDatabaseCache',
+                                                      'LOCATION': 'shop_metrics_cache'}}
+    settings.METRICS_FLUSH_INTERVAL = 0.001
+    monkeypatch.setattr(metrics.recorder, 'start_flusher', lambda: None)
+    product = product_factory()
+    try:
+        for _ in range(3):
+            time.sleep(0.002)
+            assert async_to_sync(AsyncClient().get)(f'/api/async/products/{product.pk}/').status_code == 200
+        assert metrics_cache().get(metrics.VIEWS_KEY) is None
+        text = metrics.render_metrics()
+        assert _sample(text, 'shop_request_duration_seconds_count{view="async-product-detail"}') == 3
+    finally:
+        metrics_cache().clear()
+        # Mirror connections are not closed for us before the test database is dropped.
+        connections['cache'].close()
+
+
+def test_disabled_metrics_remove_the_middleware(settings, auth_client):
+    settings.METRICS_ENABLED = False
+    with pytest.raises(MiddlewareNotUsed):
+        MetricsMiddleware(lambda request: HttpResponse())
+    auth_client.handler.load_middleware()
+    assert 'Server-Timing' not in auth_client.get('/api/cart/')
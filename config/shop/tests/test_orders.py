@@ -1,6 +1,8 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from shop.models import Order
-from shop.models import CartItem
+from shop.models import CartItem, Cart, OrderItem
 @pytest.mark.django_db
 def test_make_order_unknow_user(api_client):
     response = api_client.post('/api/orders/checkout/',{},format='json')
@@ -50,4 +52,270 @@ def test_order_total_price(auth_client,product_factory,user):
     assert Order.objects.count() == initial_count + 1
     order = Order.objects.latest('id')
     assert float(order.total_price) == float(expected_total)
-    assert CartItem.objects.filter(cart__user=user).count() == 0
\ No newline at end of file
+    assert CartItem.objects.filter(cart__user=user).count() == 0
+
+def _fill_cart(user,product_factory,lines,stock=10,quantity=1):
+    cart,_ = Cart.objects.get_or_create(user=user)
+    products = [product_factory(stock=stock,price=10) for _ in range(lines)]
+    for product in products:
+        CartItem.objects.create(cart=cart,product=product,quantity=quantity)
+    return products
+
+
+@pytest.mark.django_db
+def test_checkout_query_count_is_constant(auth_client,product_factory,user):
+    auth_client.get('/api/cart/')
+    _fill_cart(user,product_factory,lines=1)
+    with CaptureQueriesContext(connection) as small:
+        response = auth_client.post('/api/orders/checkout/',{},format='json')
+    assert response.status_code == 201
+    products = _fill_cart(user,product_factory,lines=25,quantity=3)
+    with CaptureQueriesContext(connection) as large:
+        response = auth_client.post('/api/orders/checkout/',{},format='json')
+    assert response.status_code == 201
+    assert len(large.captured_queries) == len(small.captured_queries)
+    assert OrderItem.objects.filter(order_id=response.json()['id']).count() == 25
+    for product in products:
+        product.refresh_from_db()
+        assert product.stock == 7
+
+
+@pytest.mark.django_db
+def test_checkout_not_enough_stock_rolls_back(auth_client,product_factory,user):
+    ok,short = _fill_cart(user,product_factory,lines=2,stock=2)
+    item = CartItem.objects.get(product=short)
+    item.quantity = 5
+    item.save()
+    response = auth_client.post('/api/orders/checkout/',{},format='json')
+    assert response.status_code == 400
+    assert response.json() == {
+        'detail':'Not enough stock.',
+        'key':'quantity',
+        'item_id':item.id,
+        'product_id':short.id,
+        'available':2,
+    }
+    ok.refresh_from_db()
+    assert ok.stock == 2
+    assert Order.objects.count() == 0
+    assert CartItem.objects.filter(cart__user=user).count() == 2
+
+
+@pytest.mark.django_db
+def test_cancel_restocks_aggregated_lines(auth_client,product_factory,user):
+    product = product_factory(stock=10,price=10)
+    order = Order.objects.create(user=user)
+    OrderItem.objects.create(order=order,product=product,category=product.category,quantity=2,price=10)
+    OrderItem.objects.create(order=order,product=product,category=product.category,quantity=3,price=10)
+    response = auth_client.post(f'/api/orders/{order.id}/cancel/',{},format='json')
+    assert response.status_code == 200
+    assert response.json()['status'] == Order.Status.CANCELLED
+    product.refresh_from_db()
+    assert product.stock == 15
+    response = auth_client.post(f'/api/orders/{order.id}/cancel/',{},format='json')
+    assert response.status_code == 400
+    product.refresh_from_db()
+    assert product.stock == 15
+
+
+@pytest.mark.django_db
+def test_batch_cancel_is_staff_only(auth_client,user):
+    order = Order.objects.create(user=user)
+    response = auth_client.post('/api/orders/cancel/',{'ids':[order.id]},format='json')
+    assert response.status_code == 401
+    order.refresh_from_db()
+    assert order.status == Order.Status.NEW
+
+
+@pytest.mark.django_db
+def test_batch_cancel_sums_restock_per_product(auth_client,product_factory,user):
+    user.is_staff = True
+    user.save()
+    product_1 = product_factory(stock=0,price=10)
+    product_2 = product_factory(stock=1,price=10)
+    orders = [Order.objects.create(user=user) for _ in range(3)]
+    for order in orders:
+        OrderItem.objects.create(order=order,product=product_1,category=product_1.category,quantity=2,price=10)
+        OrderItem.objects.create(order=order,product=product_2,category=product_2.category,quantity=1,price=10)
+    paid = orders[2]
+    paid.status = Order.Status.PAID
+    paid.save()
+    ids = [order.id for order in orders]
+    response = auth_client.post('/api/orders/cancel/',{'ids':ids},format='json')
+    assert response.status_code == 200
+    assert response.json() == {'cancelled':ids[:2],'skipped':[paid.id]}
+    product_1.refresh_from_db()
+    product_2.refresh_from_db()
+    assert product_1.stock == 4
+    assert product_2.stock == 3
+    assert Order.objects.filter(status=Order.Status.CANCELLED).count() == 2
+
+
+@pytest.mark.django_db
+def test_order_list_is_cursor_paginated(auth_client,user):
+    orders = [Order.objects.create(user=user) for _ in range(15)]
+    response = auth_client.get('/api/orders/')
+    assert response.status_code == 200
+    data = response.json()
+    assert [o['id'] for o in data['results']] == [o.id for o in reversed(orders)][:10]
+    assert data['previous'] is None
+    data = auth_client.get(data['next']).json()
+    assert [o['id'] for o in data['results']] == [o.id for o in reversed(orders)][10:]
+    assert data['next'] is None
+    response = auth_client.get('/api/orders/?cursor=garbage')
+    assert response.status_code == 400
+    assert response.json()['key'] == 'cursor'
+
+
+def _cart_with_item(auth_client,product_factory):
+    product = product_factory(stock=5,price=10,is_active=True)
+    auth_client.post('/api/cart/items/',{'product':product.id,'quantity':2},format='json')
+    return product
+
+
+@pytest.mark.django_db
+def test_checkout_replays_response_for_same_idempotency_key(auth_client,product_factory):
+    product = _cart_with_item(auth_client,product_factory)
+    first = auth_client.post('/api/orders/checkout/',{},format='json',HTTP_IDEMPOTENCY_KEY='abc')
+    assert first.status_code == 201
+    with CaptureQueriesContext(connection) as ctx:
+        retry = auth_client.post('/api/orders/checkout/',{},format='json',HTTP_IDEMPOTENCY_KEY='abc')
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry['Idempotent-Replayed'] == 'true'
+    assert not any('shop_product' in q['sql'] for q in ctx.captured_queries)
+    assert Order.objects.count() == 1
+    product.refresh_from_db()
+    assert product.stock == 3
+    # a new key is a new request
+    assert auth_client.post('/api/orders/checkout/',{},format='json',HTTP_IDEMPOTENCY_KEY='def').status_code == 400
+
+
+@pytest.mark.django_db
+def test_idempotency_key_errors_and_reuse(auth_client,product_factory):
+    response = auth_client.post('/api/orders/checkout/',{},format='json',HTTP_IDEMPOTENCY_KEY='k1')
+    assert response.json() == {'detail':'Cart is empty.','key':'cart'}
+    _cart_with_item(auth_client,product_factory)
+    # the stored error is replayed even though the cart has items now
+    assert auth_client.post('/api/orders/checkout/',{},format='json',HTTP_IDEMPOTENCY_KEY='k1').status_code == 400
+    order = auth_client.post('/api/orders/checkout/',{},format='json',HTTP_IDEMPOTENCY_KEY='k2').json()
+    response = auth_client.post(f'/api/orders/{order["id"]}/pay/',{},format='json',HTTP_IDEMPOTENCY_KEY='k2')
+    assert response.status_code == 422
+    assert response.json()['key'] == 'idempotency_key'
+    for _ in range(2):
+        response = auth_client.post(f'/api/orders/{order["id"]}/pay/',{},format='json',HTTP_IDEMPOTENCY_KEY='k3')
+        assert response.status_code == 200
+        assert response.json()['status'] == 'PAID'
+
+
+@pytest.mark.django_db
+def test_purge_expired_idempotency_keys(user):
+    from datetime import timedelta
+    from django.core.management import call_command
+    from django.utils import timezone
+    from shop.models import IdempotencyKey
+    now = timezone.now()
+    for i in range(5):
+        IdempotencyKey.objects.create(user=user,key=f'old-{i}',fingerprint='x',expires_at=now - timedelta(seconds=1))
+    IdempotencyKey.objects.create(user=user,key='fresh',fingerprint='x',expires_at=now + timedelta(hours=1))
+    call_command('purge_idempotency_keys','--batch-size','2')
+    assert list(IdempotencyKey.objects.values_list('key',flat=True)) == ['fresh']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_retries_wait_for_first_request(auth_client,product_factory):
+    import threading
+    from django.db import connections
+    _cart_with_item(auth_client,product_factory)
+    token = auth_client._credentials['HTTP_AUTHORIZATION']
+    barrier = threading.Barrier(2)
+    responses = []
+    def checkout():
+        from rest_framework.test import APIClient
+        client = APIClient()
+        barrier.wait()
+        responses.append(client.post('/api/orders/checkout/',{},format='json',
+                                     HTTP_AUTHORIZATION=token,HTTP_IDEMPOTENCY_KEY='same'))
+        connections.close_all()
+    threads = [threading.Thread(target=checkout) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [r.status_code for r in responses] == [201,201]
+    assert responses[0].json() == responses[1].json()
+    assert Order.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_async_checkout_job_lifecycle(auth_client,product_factory,user):
+    from django.core.management import call_command
+    product = _cart_with_item(auth_client,product_factory)
+    response = auth_client.post('/api/orders/checkout/async/',{},format='json')
+    assert response.status_code == 202
+    status_url = response['Location']
+    assert auth_client.post('/api/orders/checkout/async/',{},format='json').json() == {
+        'detail':'A checkout is already in progress.','key':'checkout'}
+    assert auth_client.get(status_url).json()['status'] == 'PENDING'
+    call_command('process_checkout_jobs','--once')
+    response = auth_client.get(status_url)
+    assert response.status_code == 200
+    order = Order.objects.get(user=user)
+    assert response.json()['id'] == order.id
+    assert response.json()['total_price'] == '20.00'
+    product.refresh_from_db()
+    assert product.stock == 3
+    assert not CartItem.objects.filter(cart__user=user).exists()
+
+
+@pytest.mark.django_db
+def test_async_checkout_replay_keeps_the_location_header(auth_client,product_factory):
+    _cart_with_item(auth_client,product_factory)
+    first = auth_client.post('/api/orders/checkout/async/',{},format='json',HTTP_IDEMPOTENCY_KEY='job')
+    retry = auth_client.post('/api/orders/checkout/async/',{},format='json',HTTP_IDEMPOTENCY_KEY='job')
+    assert retry.status_code == 202 and retry['Idempotent-Replayed'] == 'true'
+    assert retry['Location'] == first['Location'] == retry.json()['status_url']
+
+
+@pytest.mark.django_db
+def test_async_checkout_batch_shares_stock_and_reports_errors(product_factory,django_user_model):
+    from shop.models import CheckoutJob
+    from shop.services import enqueue_checkout, process_checkout_jobs
+    product = product_factory(stock=3,price=5,is_active=True)
+    jobs = []
+    for i in range(3):
+        buyer = django_user_model.objects.create_user(username=f'buyer{i}',password='x')
+        CartItem.objects.create(cart=Cart.objects.create(user=buyer),product=product,quantity=[2,2,1][i])
+        jobs.append(enqueue_checkout(buyer))
+    with CaptureQueriesContext(connection) as ctx:
+        assert process_checkout_jobs(limit=10) == 3
+    assert sum('FOR UPDATE' in q['sql'] and 'shop_product' in q['sql'] for q in ctx.captured_queries) == 1
+    first, second, third = CheckoutJob.objects.order_by('pk')
+    assert (first.status,second.status,third.status) == ('DONE','FAILED','DONE')
+    assert second.status_code == 400
+    assert second.error['available'] == 1
+    assert CartItem.objects.filter(cart__user=second.user).exists()
+    product.refresh_from_db()
+    assert product.stock == 0
+
+
+@pytest.mark.django_db
+def test_async_checkout_fails_when_the_cart_changed(auth_client,product_factory,user):
+    from shop.models import CheckoutJob
+    from shop.services import enqueue_checkout, process_checkout_jobs
+    product = _cart_with_item(auth_client,product_factory)
+    checked_out = enqueue_checkout(user)
+    assert auth_client.post('/api/orders/checkout/',{},format='json').status_code == 201
+    assert process_checkout_jobs() == 1
+    auth_client.post('/api/cart/items/',{'product':product.id,'quantity':1},format='json')
+    edited = enqueue_checkout(user)
+    CartItem.objects.filter(cart__user=user).update(quantity=2)
+    assert process_checkout_jobs() == 1
+    for job in (checked_out,edited):
+        job.refresh_from_db()
+        assert (job.status,job.status_code,job.order) == (CheckoutJob.Status.FAILED,409,None)
+        assert job.error == {'detail':'Cart changed.','key':'cart'}
+    assert Order.objects.filter(user=user).count() == 1
+    product.refresh_from_db()
+    assert product.stock == 3
+    assert CartItem.objects.get(cart__user=user).quantity == 2
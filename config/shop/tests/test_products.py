@@ -1,5 +1,8 @@
 import pytest
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from shop.models import Product
 @pytest.mark.django_db
 def test_product_list_empty(api_client):
     response = api_client.get('/api/products/')
@@ -53,3 +56,103 @@ def test_product_ordering_by_price(product_factory,api_client):
 
 
 
+@pytest.mark.django_db
+def test_product_list_served_from_cache(api_client,product_factory,django_capture_on_commit_callbacks):
+    product = product_factory(name='Macbook')
+    response = api_client.get('/api/products/?search=Macbook&page=1')
+    assert response['X-Cache'] == 'MISS'
+    with CaptureQueriesContext(connection) as ctx:
+        response = api_client.get('/api/products/?page=1&search=Macbook&ordering=')
+    assert response['X-Cache'] == 'HIT'
+    assert not any('shop_product' in query['sql'] for query in ctx.captured_queries)
+    assert response.json()['results'][0]['name'] == 'Macbook'
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        product.name = 'Macbook Pro'
+        product.save()
+        # Until the save commits, readers keep the old generation.
+        assert api_client.get('/api/products/?search=Macbook&page=1')['X-Cache'] == 'HIT'
+    assert callbacks
+    response = api_client.get('/api/products/?search=Macbook&page=1')
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['results'][0]['name'] == 'Macbook Pro'
+@pytest.mark.django_db
+def test_catalog_cache_bypassed_for_staff(api_client,product_factory):
+    from django.contrib.auth import get_user_model
+    staff = get_user_model().objects.create_user(username='staff',password='password12345',is_staff=True)
+    api_client.force_authenticate(staff)
+    product = product_factory()
+    response = api_client.get(f'/api/products/{product.id}/')
+    assert response.status_code == 200
+    assert 'X-Cache' not in response
+    stats = api_client.get('/api/catalog/cache/').json()
+    assert stats['hits'] == 0 and stats['misses'] == 0
+@pytest.mark.django_db
+def test_product_cursor_pagination_follows_ordering(api_client,product_factory):
+    prices = [100,300,200,300,50,300,75]
+    for price in prices:
+        product_factory(price=price)
+    seen = []
+    url = '/api/products/?pagination=cursor&ordering=-price&page_size=3'
+    while url:
+        data = api_client.get(url).json()
+        assert 'count' not in data
+        seen.extend(data['results'])
+        url = data['next']
+    assert [float(p['price']) for p in seen] == sorted(prices,reverse=True)
+    assert len({p['id'] for p in seen}) == len(prices)
+    previous = api_client.get(data['previous']).json() if data['previous'] else None
+    assert [p['id'] for p in previous['results']] == [p['id'] for p in seen[3:6]]
+@pytest.mark.django_db
+def test_product_search_ranks_and_tolerates_typos(api_client,product_factory):
+    product_factory(name='Wireless gaming mouse')
+    product_factory(name='Mouse pad')
+    product_factory(name='Keyboard')
+    data = api_client.get('/api/products/?search=mouse').json()
+    assert {p['name'] for p in data['results']} == {'Wireless gaming mouse','Mouse pad'}
+    data = api_client.get('/api/products/?search=keybord').json()
+    assert [p['name'] for p in data['results']] == ['Keyboard']
+    data = api_client.get('/api/products/?search=wireles').json()
+    assert [p['name'] for p in data['results']] == ['Wireless gaming mouse']
+    assert 'search_vector' not in data['results'][0]
+@pytest.mark.django_db
+def test_product_search_ranks_rows_without_a_search_vector_last(api_client,product_factory):
+    product_factory(name='Mouse pad')
+    stale = product_factory(name='Wireless mouse')
+    Product.objects.filter(pk=stale.pk).update(search_vector=None)
+    data = api_client.get('/api/products/?search=mouse').json()
+    assert [p['name'] for p in data['results']] == ['Mouse pad','Wireless mouse']
+@pytest.mark.django_db
+def test_product_list_estimated_count(api_client,product_factory,settings):
+    settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD = 1
+    product_factory(_quantity=15)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE shop_product')
+    data = api_client.get('/api/products/').json()
+    assert data['count_exact'] is False
+    assert len(data['results']) == 10
+    data = api_client.get(data['next']).json()
+    assert len(data['results']) == 5
+    assert data['next'] is None
+    data = api_client.get('/api/products/?exact_count=true').json()
+    assert data['count_exact'] is True
+    assert data['count'] == 15
+    settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD = 1000
+    data = api_client.get('/api/products/?is_active=false').json()
+    assert data['count_exact'] is True
+
+
+@pytest.mark.django_db
+def test_values_serializer_matches_product_serializer(api_client,product_factory):
+    from rest_framework.renderers import JSONRenderer
+    from shop.models import Product
+    from shop.serializers import ProductSerializer
+    from shop.values import values_serializer
+    for price in ('0.00','12.50','99999999.99'):
+        product_factory(price=price,name='Widget')
+    queryset = Product.objects.order_by('id')
+    fast = values_serializer(ProductSerializer)
+    expected = JSONRenderer().render(ProductSerializer(queryset,many=True).data)
+    assert JSONRenderer().render(fast.to_representation(fast.queryset(queryset))) == expected
+    for url in ('/api/products/?ordering=id','/api/products/?pagination=cursor&ordering=price','/api/products/?search=widget'):
+        results = api_client.get(url).json()['results']
+        assert sorted(results,key=lambda row: row['id']) == ProductSerializer(queryset,many=True).data
@@ -0,0 +1,51 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from shop.models import Product
+from shop.routers import ReplicaRouter, _read_alias, choose_replica
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ['replica_0']
+    return settings.DATABASE_REPLICAS
+
+
+def test_reads_use_primary_without_replicas(settings):
+    settings.DATABASE_REPLICAS = []
+    assert choose_replica(AnonymousUser()) is None
+    assert ReplicaRouter().db_for_read(Product) is None
+
+
+def test_router_follows_selected_alias(replicas):
+    router = ReplicaRouter()
+    token = _read_alias.set(choose_replica(AnonymousUser()))
+    try:
+        assert router.db_for_read(Product) == 'replica_0'
+        assert router.db_for_write(Product) == 'default'
+    finally:
+        _read_alias.reset(token)
+    assert router.db_for_read(Product) is None
+    assert router.allow_migrate('replica_0','shop') is False
+
+
+def test_shared_cache_tables_never_go_to_a_replica(replicas):
+    from django.core.cache.backends.db import DatabaseCache
+    router = ReplicaRouter()
+    model = DatabaseCache('shop_read_your_writes_cache',{}).cache_model_class
+    token = _read_alias.set('replica_0')
+    try:
+        assert router.db_for_read(model) == router.db_for_write(model) == 'cache'
+    finally:
+        _read_alias.reset(token)
+
+
+@pytest.mark.django_db
+def test_write_pins_user_to_primary(replicas,auth_client,user,product_factory):
+    from django.contrib.auth import get_user_model
+    other = get_user_model().objects.create_user(username='other',password='password12345')
+    assert choose_replica(user) == 'replica_0'
+    product = product_factory(stock=5)
+    response = auth_client.post('/api/cart/items/',{'product':product.id,'quantity':1},format='json')
+    assert response.status_code == 201
+    assert choose_replica(user) is None
+    assert choose_replica(other) == 'replica_0'
@@ -0,0 +1,61 @@
+from collections import Counter
+from datetime import date
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import F, Sum
+from shop.models import Cart, Category, DailySales, Order, OrderItem, Product
+
+pytestmark = pytest.mark.django_db
+
+SIZES = {'categories':5,'products':300,'users':20,'carts':10,'orders':400,'max_lines':12,
+         'days':30,'until':date(2026,1,1),'seed':7,'workers':1}
+
+
+def _load(**options):
+    bases = {model:model.objects.order_by('-id').values_list('id',flat=True).first() or 0
+             for model in (get_user_model(),Product,Order)}
+    call_command('seed_load_data',verbosity=0,**{**SIZES,**options})
+    user, product, order = bases.values()
+    orders = sorted((o.id-order,o.user_id-user,o.created_at,o.status,o.total_price)
+                    for o in Order.objects.filter(id__gt=order))
+    lines = sorted((i.order_id-order,i.product_id-product,i.quantity,i.price)
+                   for i in OrderItem.objects.filter(order_id__gt=order))
+    return orders, lines
+
+
+def test_same_seed_gives_the_same_rows_whatever_the_chunking():
+    first = _load(chunk_size=1000)
+    assert _load(chunk_size=37) == first
+    assert _load(chunk_size=1000,seed=8) != first
+    orders, lines = first
+    assert len(orders) == 400 and len(lines) > 400
+    assert Category.objects.count() == 15 and Cart.objects.count() == 30
+    assert Cart.objects.values('user').distinct().count() == 30
+    assert Product.objects.filter(search_vector__isnull=True).count() == 0
+    assert set(status for _,_,_,status,_ in orders) == set(Order.Status.values)
+    assert all(total == sum(q*p for o,_,q,p in lines if o == n) for n,_,_,_,total in orders)
+
+
+def test_popularity_and_order_sizes_are_skewed():
+    orders, lines = _load(products=1000,orders=1000)
+    sold = sorted(Counter(product for _,product,_,_ in lines).values(),reverse=True)
+    assert sum(sold[:10]) > 0.2 * len(lines)
+    sizes = Counter(Counter(order for order,_,_,_ in lines).values())
+    assert sizes[1] > sizes[2] > sizes[5] > 0 and max(sizes) > 6
+
+
+def test_rollups_and_sequences_are_ready_after_loading():
+    _load()
+    paid = OrderItem.objects.filter(order__status=Order.Status.PAID).aggregate(total=Sum(F('quantity')*F('price')))
+    assert DailySales.objects.filter(status=Order.Status.PAID).aggregate(total=Sum('revenue')) == paid
+    order = Order.objects.create(user=get_user_model().objects.first())
+    assert order.id == 401
+    assert get_user_model().objects.get(username='load-user-1').check_password('load-password')
+
+
+def test_orders_and_carts_need_enough_users():
+    with pytest.raises(CommandError):
+        call_command('seed_load_data',verbosity=0,**{**SIZES,'users':0})
+    with pytest.raises(CommandError):
+        call_command('seed_load_data',verbosity=0,**{**SIZES,'carts':21})
@@ -0,0 +1,156 @@
+import threading
+import time
+import pytest
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from shop.cache import SharedDatabaseCache
+from shop.models import Cart, CartItem
+from shop.throttling import CheckoutThrottle, TokenBucketThrottle
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(TokenBucketThrottle, 'timer', lambda self: now[0])
+    return now
+
+
+@pytest.fixture
+def rates(monkeypatch):
+    def set_rate(scope, rate):
+        monkeypatch.setitem(TokenBucketThrottle.THROTTLE_RATES, scope, rate)
+    return set_rate
+
+
+def test_checkout_bucket_refills(auth_client,user,product_factory,clock,rates):
+    rates('checkout','2/min')
+    product = product_factory(stock=10,price=5)
+    cart,_ = Cart.objects.get_or_create(user=user)
+    codes = []
+    for _ in range(3):
+        CartItem.objects.get_or_create(cart=cart,product=product)
+        codes.append(auth_client.post('/api/orders/checkout/',{},format='json').status_code)
+    assert codes == [201,201,429]
+    response = auth_client.post('/api/orders/checkout/async/',{},format='json')
+    assert response.status_code == 429
+    assert response.json() == {'detail':'Request was throttled. Expected available in 30 seconds.','key':'throttle'}
+    assert response['Retry-After'] == '30'
+    clock[0] += 30
+    assert auth_client.post('/api/orders/checkout/',{},format='json').status_code == 201
+    assert auth_client.post('/api/orders/checkout/',{},format='json').status_code == 429
+
+
+def test_token_obtain_is_limited_per_address(api_client,user,clock,rates):
+    rates('token','1/min')
+    payload = {'username':'testuser','password':'password12345'}
+    assert api_client.post('/api/auth/token/',payload,format='json').status_code == 200
+    assert api_client.post('/api/token/',payload,format='json').status_code == 429
+    assert api_client.post('/api/token/',payload,format='json',REMOTE_ADDR='10.0.0.2').status_code == 200
+
+
+def test_anonymous_catalog_reads_share_one_bucket(api_client,auth_client,product_factory,clock,rates):
+    rates('catalog_anon','2/min')
+    product = product_factory(is_active=True)
+    anon = type(api_client)()
+    assert anon.get('/api/products/').status_code == 200
+    assert anon.get(f'/api/async/products/{product.pk}/').status_code == 200
+    response = anon.get('/api/async/categories/')
+    assert response.status_code == 429
+    assert response.json()['key'] == 'throttle'
+    assert response['Retry-After'] == '30'
+    assert anon.get('/api/categories/').status_code == 429
+    assert auth_client.get('/api/products/').status_code == 200
+
+
+@pytest.fixture
+def database_throttle(settings):
+    settings.CACHES = {**settings.CACHES,'throttle':{'BACKEND':'shop.cache.SharedDatabaseCache',
+                                                     'LOCATION':'shop_throttle_cache'}}
+    yield
+    caches['throttle'].clear()
+    # Mirror connections are not closed for us before the test database is dropped.
+    connections['cache'].close()
+
+
+def _checkout_request(user):
+    request = APIRequestFactory().post('/api/orders/checkout/')
+    request.user = user
+    return request
+
+
+def test_busy_bucket_lock_rejects_instead_of_blocking(user,rates):
+    rates('checkout','60/min')
+    request = _checkout_request(user)
+    throttle = CheckoutThrottle()
+    caches['throttle'].add(f'{throttle.get_cache_key(request,None)}:lock',1)
+    assert not throttle.allow_request(request,None)
+    assert throttle.wait() == 1
+
+
+@pytest.mark.django_db(databases=['default','cache'])
+def test_shared_cache_commits_outside_the_request_transaction():
+    cache = SharedDatabaseCache('shop_throttle_cache',{})
+    try:
+        with transaction.atomic():
+            assert cache.add('bucket',1,timeout=60)
+            assert not cache.add('bucket',5)
+            assert cache.incr('bucket',2) == 3
+            transaction.set_rollback(True)
+        assert cache.get('bucket') == 3
+        with connections['cache'].cursor() as cursor:
+            cursor.execute('SELECT expires - now() FROM shop_throttle_cache')
+            assert cursor.fetchone()[0].total_seconds() <= 60
+        with pytest.raises(ValueError):
+            cache.incr('missing')
+    finally:
+        cache.clear()
+        # Mirror connections are not closed for us before the test database is dropped.
+        connections['cache'].close()
+
+
+@pytest.mark.django_db(databases=['default','cache'])
+def test_database_bucket_is_one_locked_update_per_request(user,rates,database_throttle):
+    rates('checkout','2/min')
+    request = _checkout_request(user)
+    with CaptureQueriesContext(connections['cache']) as ctx:
+        allowed = [CheckoutThrottle().allow_request(request,None) for _ in range(3)]
+    assert allowed == [True,True,False]
+    statements = [q['sql'].split()[0] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+    # No COUNT(*) culling and no lock key: insert the bucket, then update it.
+    assert statements == ['SELECT','INSERT','DELETE','SELECT','UPDATE','SELECT','UPDATE']
+
+
+@pytest.mark.django_db(databases=['default','cache'])
+def test_database_bucket_waits_for_a_busy_row_instead_of_rejecting(user,rates,database_throttle):
+    rates('checkout','60/min')
+    request = _checkout_request(user)
+    held, results = threading.Event(), {}
+
+    def hold():
+        # Keeps the new bucket row locked (and uncommitted) for a while.
+        with transaction.atomic(using='cache'):
+            results['first'] = CheckoutThrottle().allow_request(request,None)
+            held.set()
+            time.sleep(0.3)
+        connections['cache'].close()
+
+    def contend():
+        held.wait()
+        started = time.monotonic()
+        results['second'] = CheckoutThrottle().allow_request(request,None)
+        results['waited'] = time.monotonic() - started
+        connections['cache'].close()
+
+    threads = [threading.Thread(target=hold),threading.Thread(target=contend)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results['first'] and results['second']
+    assert results['waited'] >= 0.2
+    tokens, _ = caches['throttle'].get(CheckoutThrottle().get_cache_key(request,None))
+    assert 57 < tokens < 59
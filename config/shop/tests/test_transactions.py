@@ -0,0 +1,106 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework_simplejwt.tokens import RefreshToken
+from shop import urls
+from shop.models import Cart, CartItem, CheckoutJob, Order, OrderItem
+from shop.transactions import AtomicWriteMixin
+
+pytestmark = pytest.mark.django_db
+
+METHODS = ('get', 'post', 'put', 'patch', 'delete')
+# Write endpoints that open their own transaction in a service call instead
+# of wrapping the whole request.
+SELF_MANAGED = {
+    ('api/catalog/import/<str:kind>/', 'post'),
+    ('api/cart/items/batch/', 'post'),
+    ('api/orders/checkout/', 'post'),
+    ('api/orders/cancel/', 'post'),
+    ('api/orders/<int:pk>/cancel/', 'post'),
+}
+# Token endpoints only read and sign, so they stay in autocommit.
+READ_ONLY_WRITES = {('api/token/', 'post'), ('api/token/refresh/', 'post'), ('api/token/verify/', 'post')}
+
+
+def endpoints():
+    for pattern in urls.urlpatterns:
+        view = pattern.callback.cls
+        for method in METHODS:
+            if hasattr(view, method):
+                yield pytest.param(str(pattern.pattern), method, view, id=f'{method} {pattern.pattern}')
+
+
+@pytest.fixture
+def world(api_client):
+    staff = get_user_model().objects.create_user(username='staff',password='password12345',is_staff=True)
+    api_client.force_authenticate(staff)
+    product = baker.make('shop.Product',slug='macbook',stock=50,price=10,is_active=True)
+    spare = baker.make('shop.Product',stock=5,price=10,is_active=True)
+    item = CartItem.objects.create(cart=Cart.objects.create(user=staff),product=product,quantity=1)
+    order = Order.objects.create(user=staff,status=Order.Status.NEW,total_price=10)
+    OrderItem.objects.create(order=order,product=product,category=product.category,quantity=1,price=10)
+    job = CheckoutJob.objects.create(user=staff,items=[],status=CheckoutJob.Status.DONE,order=order)
+    return {'client':api_client,'staff':staff,'product':product,'spare':spare,'item':item,'order':order,'job':job}
+
+
+def make_request(world, route, method):
+    product, spare, order = world['product'], world['spare'], world['order']
+    category = product.category
+    pk = {
+        'api/products/<int:pk>/': spare.pk if method == 'delete' else product.pk,
+        'api/categories/<int:pk>/': category.pk,
+        'api/cart/items/<int:pk>/': world['item'].pk,
+        'api/orders/checkout/jobs/<int:pk>/': world['job'].pk,
+    }.get(route, order.pk)
+    path = '/' + route.replace('<int:pk>', str(pk)).replace('<str:kind>', 'product')
+    if route == 'api/catalog/import/<str:kind>/':
+        body = f'slug,name,category,price,stock\nmacbook,Macbook,{category.slug},5,3\n'
+        return world['client'].generic(method.upper(), path, body, content_type='text/csv')
+    refresh = RefreshToken.for_user(world['staff'])
+    payload = {
+        'api/products/': {'name':'Pixel','slug':'pixel','category':category.pk,'price':'5.00','stock':1},
+        'api/products/<int:pk>/': {'name':'Macbook','slug':'macbook','category':category.pk,'price':'9.00','stock':50},
+        'api/categories/': {'name':'Phones','slug':'phones'},
+        'api/categories/<int:pk>/': {'name':'Laptops','slug':'laptops'},
+        'api/cart/items/': {'product':spare.pk,'quantity':1},
+        'api/cart/items/batch/': {'operations':[{'op':'add','product':spare.pk,'quantity':1}]},
+        'api/cart/items/<int:pk>/': {'quantity':2},
+        'api/orders/cancel/': {'ids':[order.pk]},
+        'api/token/': {'username':'staff','password':'password12345'},
+        'api/token/refresh/': {'refresh':str(refresh)},
+        'api/token/verify/': {'token':str(refresh.access_token)},
+    }.get(route, {})
+    if method == 'get':
+        return world['client'].get(path)
+    return getattr(world['client'], method)(path, payload, format='json')
+
+
+@pytest.mark.parametrize('route,method,view', list(endpoints()))
+def test_transaction_boundaries(world, route, method, view):
+    with CaptureQueriesContext(connection) as ctx:
+        response = make_request(world, route, method)
+    assert response.status_code < 400, response.content
+    sql = [query['sql'] for query in ctx.captured_queries]
+    savepoints = [statement for statement in sql if statement.startswith('SAVEPOINT')]
+    if method == 'get' or (route, method) in READ_ONLY_WRITES:
+        assert not savepoints
+    elif (route, method) in SELF_MANAGED:
+        assert not issubclass(view, AtomicWriteMixin)
+        assert savepoints
+    else:
+        # The whole request, authentication included, runs in one block.
+        assert issubclass(view, AtomicWriteMixin)
+        assert sql[0].startswith('SAVEPOINT')
+        assert sql[-1].startswith('RELEASE SAVEPOINT')
+        assert not any(statement.startswith('ROLLBACK') for statement in sql)
+
+
+def test_error_response_rolls_back_request_transaction(auth_client, product_factory, user):
+    product = product_factory(stock=1,is_active=True)
+    item = CartItem.objects.create(cart=Cart.objects.create(user=user),product=product,quantity=1)
+    with CaptureQueriesContext(connection) as ctx:
+        response = auth_client.patch(f'/api/cart/items/{item.pk}/',{'quantity':5},format='json')
+    assert response.status_code == 400
+    assert any(query['sql'].startswith('ROLLBACK TO SAVEPOINT') for query in ctx.captured_queries)
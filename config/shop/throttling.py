@@ -0,0 +1,95 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    # A bucket of `num_requests` tokens per client and scope, refilled at
+    # num_requests/duration tokens a second, so a client may burst up to the
+    # full rate and is then held to the average. The bucket lives in
+    # THROTTLE_CACHE_ALIAS. A backend with an atomic update() (the default
+    # SharedDatabaseCache) changes it under a row lock; on any other shared
+    # backend a short add()-based lock per bucket makes the read-modify-write
+    # atomic across processes.
+    lock_timeout = 1
+    lock_wait = 0.1
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        # An untouched bucket is full again after `duration`.
+        update = getattr(self.cache, 'update', None)
+        if update is not None:
+            return update(self.key, self.take, timeout=self.duration)
+        lock = f'{self.key}:lock'
+        deadline = time.monotonic() + self.lock_wait
+        while not self.cache.add(lock, 1, timeout=self.lock_timeout):
+            if time.monotonic() >= deadline:
+                # Every request sharing the key contends here, which for the
+                # address-keyed scopes means everyone behind one NAT.
+                self._wait = self.duration / self.num_requests
+                return False
+            time.sleep(0.002)
+        try:
+            bucket, allowed = self.take(self.cache.get(self.key))
+            self.cache.set(self.key, bucket, timeout=self.duration)
+        finally:
+            self.cache.delete(lock)
+        return allowed
+
+    def take(self, bucket):
+        # (tokens, stamp) -> the bucket after this request, and whether it
+        # is allowed.
+        now = self.timer()
+        refill = self.num_requests / self.duration
+        tokens, stamp = bucket or (self.num_requests, now)
+        tokens = min(self.num_requests, tokens + max(now - stamp, 0) * refill)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._wait = None if allowed else (1 - tokens) / refill
+        return (tokens, max(now, stamp)), allowed
+
+    def wait(self):
+        return self._wait
+
+
+class CheckoutThrottle(TokenBucketThrottle):
+    scope = 'checkout'
+
+
+class CartThrottle(TokenBucketThrottle):
+    scope = 'cart'
+
+
+class TokenObtainThrottle(TokenBucketThrottle):
+    # Per client address: the caller is not authenticated yet.
+    scope = 'token'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class AnonCatalogThrottle(TokenBucketThrottle):
+    scope = 'catalog_anon'
+
+    def get_cache_key(self, request, view):
+        if request.method not in SAFE_METHODS or (request.user and request.user.is_authenticated):
+            return None
+        return super().get_cache_key(request, view)
@@ -0,0 +1,20 @@
+from django.db import transaction
+from rest_framework.permissions import SAFE_METHODS
+
+
+class AtomicWriteMixin:
+    # Runs unsafe methods in one transaction (what ATOMIC_REQUESTS used to do
+    # for every request) and leaves safe methods in autocommit. Error
+    # responses produced by the exception handler roll the transaction back.
+    def dispatch(self, request, *args, **kwargs):
+        self._request_atomic = request.method not in SAFE_METHODS
+        if not self._request_atomic:
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic():
+            return super().dispatch(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        response = super().handle_exception(exc)
+        if self._request_atomic:
+            transaction.set_rollback(True)
+        return response
@@ -1,21 +1,33 @@
 from django.contrib import admin
 from django.urls import path,include
-from .views import ProductListCreateView,CategoryListCreateView,ProductDetailAPIView,CategoryDetailAPIView,CartAPIView,CartItemCreateAPIView,CartItemUpdateView,OrderItemCreateAPI,OrderDetailAPIView,OrderListAPIView,OrderPayAPIView,OrderCancelAPIView
-from rest_framework_simplejwt.views import TokenObtainPairView,TokenRefreshView,TokenVerifyView
+from .views import ThrottledTokenObtainPairView,ReadinessAPIView,MetricsAPIView,ProductListCreateView,CatalogCacheStatsAPIView,CatalogImportAPIView,CatalogExportAPIView,CategoryListCreateView,ProductDetailAPIView,CategoryDetailAPIView,CartAPIView,CartItemCreateAPIView,CartItemUpdateView,CartBatchAPIView,OrderItemCreateAPI,CheckoutEnqueueAPIView,CheckoutJobAPIView,OrderDetailAPIView,OrderListAPIView,OrderPayAPIView,OrderCancelAPIView,OrderBatchCancelAPIView,SalesReportAPIView,TopProductsAPIView,TopCategoriesAPIView
+from rest_framework_simplejwt.views import TokenRefreshView,TokenVerifyView
 urlpatterns = [
     path('api/products/' ,ProductListCreateView.as_view() ,name='product-list-create'),
     path('api/products/<int:pk>/', ProductDetailAPIView.as_view(), name='product-detail'),
     path('api/categories/' ,CategoryListCreateView.as_view() ,name='categories-list-create'),
     path('api/categories/<int:pk>/' ,CategoryDetailAPIView.as_view() ,name='categories-list-create'),
+    path("api/health/ready/", ReadinessAPIView.as_view(), name="readiness"),
+    path("metrics", MetricsAPIView.as_view(), name="metrics"),
+    path("api/catalog/cache/", CatalogCacheStatsAPIView.as_view(), name="catalog-cache-stats"),
+    path("api/catalog/import/<str:kind>/", CatalogImportAPIView.as_view(), name="catalog-import"),
+    path("api/catalog/export/<str:kind>/", CatalogExportAPIView.as_view(), name="catalog-export"),
     path("api/cart/", CartAPIView.as_view(), name="cart-detail"),
     path("api/cart/items/", CartItemCreateAPIView.as_view(), name="cart-item-create"),
+    path("api/cart/items/batch/", CartBatchAPIView.as_view(), name="cart-batch"),
     path("api/cart/items/<int:pk>/", CartItemUpdateView.as_view(), name="cart-item-detail"),
     path("api/orders/checkout/", OrderItemCreateAPI.as_view(), name="order-checkout"),
+    path("api/orders/checkout/async/", CheckoutEnqueueAPIView.as_view(), name="order-checkout-async"),
+    path("api/orders/checkout/jobs/<int:pk>/", CheckoutJobAPIView.as_view(), name="checkout-job-detail"),
     path("api/orders/<int:pk>/", OrderDetailAPIView.as_view(), name="order-detail"),
     path("api/orders/", OrderListAPIView.as_view(), name="order-list"),
+    path("api/orders/cancel/", OrderBatchCancelAPIView.as_view(), name="order-batch-cancel"),
     path("api/orders/<int:pk>/pay/", OrderPayAPIView.as_view(), name="order-pay"),
     path("api/orders/<int:pk>/cancel/", OrderCancelAPIView.as_view(), name="order-cancel"),
-    path('api/token/',TokenObtainPairView.as_view(),name='token-pair'),
+    path("api/analytics/sales/", SalesReportAPIView.as_view(), name="analytics-sales"),
+    path("api/analytics/top/products/", TopProductsAPIView.as_view(), name="analytics-top-products"),
+    path("api/analytics/top/categories/", TopCategoriesAPIView.as_view(), name="analytics-top-categories"),
+    path('api/token/',ThrottledTokenObtainPairView.as_view(),name='token-pair'),
     path('api/token/refresh/',TokenRefreshView.as_view(),name='refresh-token'),
     path('api/token/verify/',TokenVerifyView.as_view(),name='token-verify')
 
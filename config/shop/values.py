@@ -0,0 +1,88 @@
+from decimal import Decimal
+from functools import cache, partial
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import fields, relations
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Field types whose to_representation returns what .values() already gives.
+PASSTHROUGH = (fields.CharField, fields.IntegerField, fields.BooleanField)
+
+
+def _decimal_converter(field):
+    if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) \
+            or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    exponent = Decimal('.1') ** field.decimal_places
+    return lambda value: f'{value.quantize(exponent):f}'
+
+
+def _datetime_converter(field):
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT) != fields.ISO_8601 or hasattr(field, 'timezone'):
+        return field.to_representation
+
+    def convert(value, tz):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    # Looking up the active timezone per value costs more than the rest of
+    # the conversion, so it is bound once per to_representation() call.
+    convert.needs_timezone = True
+    return convert
+
+
+class ValuesSerializer:
+    # Read-only twin of a ModelSerializer for list endpoints: the queryset
+    # selects just the serializer's columns with .values(), and rows go
+    # straight to dicts through converters picked once per field instead of
+    # building model instances and calling every field's to_representation.
+    # The output is the same as serializer_class(rows, many=True).data.
+    def __init__(self, serializer_class):
+        self.columns = []
+        for field in serializer_class()._readable_fields:
+            if field.source == '*' or '.' in field.source or isinstance(field, relations.ManyRelatedField):
+                raise ImproperlyConfigured(f'{serializer_class.__name__}.{field.field_name} cannot be read with .values().')
+            if isinstance(field, PASSTHROUGH) or (isinstance(field, relations.PrimaryKeyRelatedField) and not field.pk_field):
+                converter = None
+            elif isinstance(field, fields.DecimalField):
+                converter = _decimal_converter(field)
+            elif isinstance(field, fields.DateTimeField):
+                converter = _datetime_converter(field)
+            else:
+                converter = field.to_representation
+            self.columns.append((field.field_name, field.source, converter))
+
+    def queryset(self, queryset):
+        return queryset.values(*[source for _, source, _ in self.columns])
+
+    def to_representation(self, rows):
+        tz = timezone.get_current_timezone()
+        columns = [
+            (name, source, partial(converter, tz=tz) if getattr(converter, 'needs_timezone', False) else converter)
+            for name, source, converter in self.columns
+        ]
+        return [
+            {name: row[source] if converter is None or row[source] is None else converter(row[source])
+             for name, source, converter in columns}
+            for row in rows
+        ]
+
+
+@cache
+def values_serializer(serializer_class):
+    return ValuesSerializer(serializer_class)
+
+
+class ValuesListMixin:
+    # list() for generic views through ValuesSerializer; everything else
+    # (create, retrieve, the schema) keeps using serializer_class.
+    def get_values_serializer(self):
+        return values_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        queryset = serializer.queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(queryset))
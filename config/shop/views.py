@@ -1,84 +1,181 @@
+from decimal import Decimal
 from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import generics
-from .models import Category,Product,Cart,CartItem,Order,OrderItem
-from .serializers import ProductSerializer,CategorySerializer,CartSerializer,CartItemSerializer,OrderSerializer,OrderItemSerializer
+from django.db.models import Sum
+from .models import Category,Product,Cart,CartItem,CheckoutJob,Order,OrderItem,DailySales,CategorySales,ProductSales
+from .serializers import ProductSerializer,CategorySerializer,CartSerializer,CartItemSerializer,OrderSerializer,OrderItemSerializer,OrderBatchCancelSerializer,CartOperationSerializer,SalesQuerySerializer,TopSalesQuerySerializer,SalesRowSerializer,DailySalesSerializer,ProductSalesSerializer,CategorySalesSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter,OrderingFilter
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
+from rest_framework.reverse import reverse
 from rest_framework import serializers
-from django.db import transaction
+from rest_framework_simplejwt.views import TokenObtainPairView
+from django.db import connection, transaction
+from django.db.utils import OperationalError
 from .permissions import IsAdminOrReadOnly
 from .exceptions import NotFoundKeyed, StockError, KeyedAPIException
+from .search import ProductSearchFilter
+from .pagination import OrderPagination, ProductPagination
+from .bulk import FORMATS, export_catalog, get_spec, import_catalog, read_records
+from .transactions import AtomicWriteMixin
+from .values import ValuesListMixin, values_serializer
+from .idempotency import idempotent
+from .throttling import AnonCatalogThrottle, CartThrottle, CheckoutThrottle, TokenObtainThrottle
+from .analytics import record_sales
+from .routers import ReplicaReadMixin
+from .cache import CatalogCacheMixin, cache_stats
+from .metrics import render_metrics
+from .services import add_to_cart, apply_cart_operations, place_order, enqueue_checkout, cancel_order, cancel_orders
 # Create your views here.
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductListCreateView(AtomicWriteMixin,ReplicaReadMixin,CatalogCacheMixin,ValuesListMixin,generics.ListCreateAPIView):
+    cache_namespace = 'product-list'
     queryset = Product.objects.all()
     permission_classes = [IsAdminOrReadOnly]
+    throttle_classes = [AnonCatalogThrottle]
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend,SearchFilter,OrderingFilter]
+    filter_backends = [DjangoFilterBackend,ProductSearchFilter,OrderingFilter]
     filterset_fields = ['category','is_active']
     ordering_fields = ['price','created_at']
+    pagination_class = ProductPagination
     search_fields = ['name']
 
-class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailAPIView(AtomicWriteMixin,ReplicaReadMixin,CatalogCacheMixin,generics.RetrieveUpdateDestroyAPIView):
+    cache_namespace = 'product-detail'
     queryset = Product.objects.all()
     permission_classes = [IsAdminOrReadOnly]
+    throttle_classes = [AnonCatalogThrottle]
     serializer_class = ProductSerializer
 
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(AtomicWriteMixin,ReplicaReadMixin,CatalogCacheMixin,ValuesListMixin,generics.ListCreateAPIView):
+    cache_namespace = 'category-list'
     queryset = Category.objects.all()
     permission_classes = [IsAdminOrReadOnly]
+    throttle_classes = [AnonCatalogThrottle]
     serializer_class = CategorySerializer
     filter_backends = [SearchFilter,OrderingFilter]
     ordering_fields = ['name']
     search_fields = ['name']
 
-class CategoryDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailAPIView(AtomicWriteMixin,ReplicaReadMixin,CatalogCacheMixin,generics.RetrieveUpdateDestroyAPIView):
+    cache_namespace = 'category-detail'
     queryset = Category.objects.all()
     permission_classes = [IsAdminOrReadOnly]
+    throttle_classes = [AnonCatalogThrottle]
     serializer_class = CategorySerializer
 
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    # Password hashing is CPU-bound, so logins are limited per client address.
+    throttle_classes = [TokenObtainThrottle]
+
+
+class ReadinessAPIView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    def get(self,request,*args,**kwargs):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except OperationalError:
+            raise KeyedAPIException(detail="Database unavailable.", key="database", status_code=503)
+        return Response({'status':'ready'},status=status.HTTP_200_OK)
+
+
+class CatalogCacheStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    def get(self,request,*args,**kwargs):
+        return Response(cache_stats(),status=status.HTTP_200_OK)
+
+
+class MetricsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    def get(self,request,*args,**kwargs):
+        if not settings.METRICS_ENABLED:
+            raise NotFoundKeyed("Metrics are disabled.", key="metrics")
+        return HttpResponse(render_metrics(),content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class CatalogImportAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    def post(self,request,kind,*args,**kwargs):
+        fmt = FORMATS.get(request.content_type.split(';')[0].strip())
+        if fmt is None:
+            raise KeyedAPIException(detail="Send text/csv or application/x-ndjson.", key="content_type", status_code=415)
+        if request.stream is None:
+            raise KeyedAPIException(detail="Request body is empty.", key="body")
+        result = import_catalog(kind,read_records(request.stream,fmt))
+        return Response(result,status=status.HTTP_200_OK)
+
+
+class CatalogExportAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    def get(self,request,kind,*args,**kwargs):
+        fmt = 'ndjson' if request.query_params.get('type') == 'ndjson' else 'csv'
+        get_spec(kind)
+        content_type = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+        response = StreamingHttpResponse(export_catalog(kind,fmt),content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+        return response
+
+
 class CartAPIView(APIView):
     permission_classes  = [IsAuthenticated]
     def get(self,request,*args,**kwargs):
-        cart,_ = Cart.objects.get_or_create(user=request.user)
+        cart,_ = Cart.objects.with_totals().get_or_create(user=request.user)
         serializer = CartSerializer(cart)
         return Response(serializer.data,status=status.HTTP_200_OK)
 
 
-class CartItemCreateAPIView(APIView):
+class CartItemCreateAPIView(AtomicWriteMixin,APIView):
     permission_classes  = [IsAuthenticated]
+    throttle_classes = [CartThrottle]
     def post(self,request,*args,**kwargs):
         cart,_ = Cart.objects.get_or_create(user=request.user)
         serializer = CartItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         product = serializer.validated_data.get('product')
-        quantity = serializer.validated_data.get('quantity')
+        quantity = serializer.validated_data.get('quantity',1)
         if not product:
             raise NotFoundKeyed("Product not found.", key="product")
         if not product.is_active:
             raise KeyedAPIException(detail="Product is inactive.", key="product")
-        existing = CartItem.objects.filter(cart=cart,product=product).first()
-        if existing:
-            final_qnt = existing.quantity + quantity
-            if final_qnt > product.stock:
-                raise serializers.ValidationError({"quantity": f"Only {product.stock} items in stock."})
-            existing.quantity = final_qnt
-            existing.save()
-            return Response(CartItemSerializer(existing).data,status=status.HTTP_200_OK)
-        else:
-            if quantity>product.stock:
-                raise StockError(available=product.stock)
-            else:
-                item = serializer.save(cart=cart)
-                return Response(CartItemSerializer(item).data,status=status.HTTP_201_CREATED)
+        item,created = add_to_cart(cart,product,quantity)
+        if item is None:
+            raise serializers.ValidationError({"quantity": f"Only {product.stock} items in stock."})
+        return Response(CartItemSerializer(item).data,status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
-class CartItemUpdateView(APIView):
+class CartBatchAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [CartThrottle]
+    max_operations = 500
+    def post(self,request,*args,**kwargs):
+        operations = request.data.get('operations') if isinstance(request.data,dict) else None
+        if not isinstance(operations,list) or not operations:
+            raise KeyedAPIException(detail="Expected a non-empty list of operations.", key="operations")
+        if len(operations) > self.max_operations:
+            raise KeyedAPIException(detail=f"At most {self.max_operations} operations per request.", key="operations")
+        validated = []
+        for index,operation in enumerate(operations):
+            serializer = CartOperationSerializer(data=operation)
+            if not serializer.is_valid():
+                key,msg = next(iter(serializer.errors.items()))
+                msg = msg[0] if isinstance(msg,list) else msg
+                raise KeyedAPIException(detail=msg, key=key, index=index)
+            validated.append(serializer.validated_data)
+        cart,_ = Cart.objects.get_or_create(user=request.user)
+        apply_cart_operations(cart,validated)
+        cart = Cart.objects.with_totals().get(pk=cart.pk)
+        return Response(CartSerializer(cart).data,status=status.HTTP_200_OK)
+
+class CartItemUpdateView(AtomicWriteMixin,APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [CartThrottle]
     def patch(self,request,pk,*args,**kwargs):
         item = get_object_or_404(CartItem,pk=pk,cart__user=request.user)
         if not item:
@@ -101,8 +198,9 @@ class CartItemUpdateView(APIView):
         serializer.save()
         return Response(CartItemSerializer(item).data,status=status.HTTP_200_OK)
 
-class CartItemDeleteAPI(APIView):
+class CartItemDeleteAPI(AtomicWriteMixin,APIView):
     permission_classes=[IsAuthenticated]
+    throttle_classes = [CartThrottle]
     def delete(self,request,pk,*args,**kwargs):
         item = get_object_or_404(CartItem,pk=pk,cart__user=request.user)
         if not item:
@@ -112,36 +210,32 @@ class CartItemDeleteAPI(APIView):
 
 class OrderItemCreateAPI(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [CheckoutThrottle]
+    @idempotent
     def post(self,request,*args,**kwargs):
-        cart = Cart.objects.filter(user=request.user).first()
-        if cart is None or cart.items.count() == 0:
-            raise KeyedAPIException(detail="Cart is empty.", key="cart")
-        with transaction.atomic():
-            order = Order.objects.create(user=request.user,status=Order.Status.NEW)
-            total = 0
-            for item in cart.items.select_related('product').all():
-                product = Product.objects.select_for_update().get(pk=item.product_id)
-                if not product.is_active:
-                    raise KeyedAPIException(detail="Product is inactive.", key="product")
-                if item.quantity > product.stock:
-                    raise KeyedAPIException(
-                        detail="Not enough stock.",
-                        key="quantity",
-                        item_id=item.id,
-                        product_id=product.id,
-                        available=product.stock,
-                    )
-                item_sum = item.product.price * item.quantity
-                total +=item_sum
-                OrderItem.objects.create(order=order,product=product,quantity=item.quantity,price=product.price)
-                product.stock -= item.quantity
-                product.save()
-            order.total_price = total
-            order.save()
-            cart.items.all().delete()
+        order = place_order(request.user)
         return Response(OrderSerializer(order).data,status=status.HTTP_201_CREATED)
 
-class OrderDetailAPIView(APIView):
+class CheckoutEnqueueAPIView(AtomicWriteMixin,APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [CheckoutThrottle]
+    @idempotent
+    def post(self,request,*args,**kwargs):
+        job = enqueue_checkout(request.user)
+        url = reverse('checkout-job-detail',kwargs={'pk':job.pk},request=request)
+        return Response({'id':job.pk,'status':job.status,'status_url':url},status=status.HTTP_202_ACCEPTED,headers={'Location':url})
+
+class CheckoutJobAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    def get(self,request,pk,*args,**kwargs):
+        job = get_object_or_404(CheckoutJob.objects.select_related('order'),pk=pk,user=request.user)
+        if job.status == CheckoutJob.Status.DONE:
+            return Response(OrderSerializer(job.order).data,status=status.HTTP_200_OK)
+        if job.status == CheckoutJob.Status.FAILED:
+            return Response(job.error,status=job.status_code)
+        return Response({'id':job.pk,'status':job.status},status=status.HTTP_202_ACCEPTED)
+
+class OrderDetailAPIView(ReplicaReadMixin,APIView):
     permission_classes = [IsAuthenticated]
     def get(self,request,pk,*args,**kwargs):
         order = get_object_or_404(Order,pk=pk,user=request.user)
@@ -151,37 +245,98 @@ class OrderDetailAPIView(APIView):
         return Response(serializer.data,status=status.HTTP_200_OK)
 
 
-class OrderListAPIView(APIView):
+class OrderListAPIView(ReplicaReadMixin,APIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderPagination
     def get(self,request,*args,**kwargs):
-        order = Order.objects.filter(user=request.user).order_by('-created_at').prefetch_related('items__product')
-        serializer = OrderSerializer(order,many=True)
-        return Response(serializer.data,status=status.HTTP_200_OK)
+        orders = Order.objects.filter(user=request.user).prefetch_related('items')
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(orders,request,view=self)
+        serializer = OrderSerializer(page,many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-class OrderPayAPIView(APIView):
+class OrderPayAPIView(AtomicWriteMixin,APIView):
     permission_classes = [IsAuthenticated]
+    @idempotent
     def post(self,request,pk,*args,**kwargs):
-        order = get_object_or_404(Order,pk=pk,user=request.user)
+        order = get_object_or_404(Order.objects.select_for_update(),pk=pk,user=request.user)
         if not order:
             raise NotFoundKeyed("Order not found.", key="order")
         if order.status != Order.Status.NEW:
            raise KeyedAPIException(detail="Only NEW orders can be paid.", key="status")
+        record_sales([order.pk],Order.Status.PAID,previous=order.status)
         order.status = Order.Status.PAID
-        order.save()
+        order.save(update_fields=['status'])
         return Response(OrderSerializer(order).data,status=status.HTTP_200_OK)
 class OrderCancelAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    @idempotent
     def post(self,request,pk,*args,**kwargs):
-        order = get_object_or_404(Order,pk=pk,user=request.user)
-        if not order:
-            raise NotFoundKeyed("Order not found.", key="order")
-        if order.status != Order.Status.NEW:
-            raise KeyedAPIException(detail="Only NEW orders can be cancelled.", key="status")
-        with transaction.atomic():
-            for item in order.items.select_related('product').all():
-                product = Product.objects.select_for_update().get(pk=item.product_id)
-                product.stock+=item.quantity
-                product.save()
-            order.status=Order.Status.CANCELLED
-            order.save()
+        order = cancel_order(request.user,pk)
         return Response(OrderSerializer(order).data,status=status.HTTP_200_OK)
+
+class OrderBatchCancelAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    def post(self,request,*args,**kwargs):
+        serializer = OrderBatchCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        cancelled = cancel_orders(ids)
+        skipped = sorted(set(ids) - set(cancelled))
+        return Response({'cancelled':cancelled,'skipped':skipped},status=status.HTTP_200_OK)
+
+
+SALES_TOTALS = {'revenue':Sum('revenue'),'units':Sum('units'),'orders':Sum('orders')}
+
+class SalesReportAPIView(ReplicaReadMixin,APIView):
+    # Daily totals from the rollup tables; days without sales are omitted.
+    permission_classes = [IsAdminUser]
+    def get(self,request,*args,**kwargs):
+        query = SalesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        if 'product' in params:
+            qs = ProductSales.objects.filter(product=params['product'])
+        elif 'category' in params:
+            qs = CategorySales.objects.filter(category=params['category'])
+        else:
+            qs = DailySales.objects.all()
+        rows = list(qs.filter(status=params['status'],day__range=(params['start'],params['end']))
+                    .values('day').annotate(**SALES_TOTALS).order_by('day'))
+        total = {'revenue':sum((row['revenue'] for row in rows),Decimal(0)),
+                 'units':sum(row['units'] for row in rows),'orders':sum(row['orders'] for row in rows)}
+        return Response({
+            'start':params['start'],'end':params['end'],'status':params['status'],
+            'total':values_serializer(SalesRowSerializer).to_representation([total])[0],
+            'results':values_serializer(DailySalesSerializer).to_representation(rows),
+        },status=status.HTTP_200_OK)
+
+
+class TopSalesAPIView(ReplicaReadMixin,APIView):
+    permission_classes = [IsAdminUser]
+    model = None
+    dimension = None
+    serializer_class = None
+    def get(self,request,*args,**kwargs):
+        query = TopSalesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        qs = self.model.objects.filter(status=params['status'],day__range=(params['start'],params['end']))
+        if 'category' in params:
+            qs = qs.filter(category=params['category'])
+        rows = (qs.values(self.dimension,f'{self.dimension}__name').annotate(**SALES_TOTALS)
+                .order_by(f'-{params["by"]}',self.dimension)[:params['limit']])
+        return Response({
+            'start':params['start'],'end':params['end'],'status':params['status'],'by':params['by'],
+            'results':values_serializer(self.serializer_class).to_representation(rows),
+        },status=status.HTTP_200_OK)
+
+class TopProductsAPIView(TopSalesAPIView):
+    model = ProductSales
+    dimension = 'product'
+    serializer_class = ProductSalesSerializer
+
+class TopCategoriesAPIView(TopSalesAPIView):
+    model = CategorySales
+    dimension = 'category'
+    serializer_class = CategorySalesSerializer